@@ -8,7 +8,9 @@ import requests
 import sys
 import os
 # Add script directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, _SCRIPT_DIR)
 
 from utils import (
     log, LogLevel, retry_on_failure, chunked, extract_asset_items
@@ -32,12 +34,12 @@ class RateLimiter:
     def wait(self):
         """Wait if necessary to respect rate limit."""
         with self.lock:
-            now = time.time()
+            now = time.monotonic()
             time_since_last = now - self.last_call
             if time_since_last < self.min_interval:
                 sleep_time = self.min_interval - time_since_last
                 time.sleep(sleep_time)
-            self.last_call = time.time()
+            self.last_call = time.monotonic()
 
 
 _rate_limiter = RateLimiter(calls_per_second=10.0)
@@ -1,15 +1,18 @@
 """EXIF/XMP metadata handling for Immich Ultra-Sync."""
 
 import datetime
+from functools import lru_cache
 import json
 import re
 import subprocess
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import sys
 import os
 # Add script directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, _SCRIPT_DIR)
 
 from utils import (
     log, LogLevel, extract_error_message,
@@ -19,6 +22,13 @@ from utils import (
     normalize_caption_limit
 )
 
+# Optional C-accelerated parser for ExifTool -json output (falls back to stdlib json)
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 
 # ==============================================================================
 # EXIFTOOL STAY-OPEN MODE
@@ -69,27 +79,103 @@ class ExifToolHelper:
             self.process.stdin.flush()
             self.process.wait()
 
+# ExifTool warnings for a MicrosoftPhoto tag that cannot be written to this file type, e.g.
+# "Warning: Sorry, MicrosoftPhoto:Rating doesn't exist or isn't writable"
+_MSPHOTO_WARN_RE = re.compile(r"MicrosoftPhoto:\w+'? (?:doesn't exist or isn't writable|is not (?:defined|writable))")
+
+
+def _path_key(path: str) -> str:
+    """Comparable form of a path; ExifTool reports SourceFile with "/" separators on Windows."""
+    return os.path.normcase(os.path.normpath(path))
+
+
+def read_rating_info(paths: List[str], log_file: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Read Rating/XMP:Rating/RatingPercent for a file and its sidecar with one ExifTool call.
+
+    Returns a dict mapping each readable path to its tag values, keyed by _path_key()
+    of ExifTool's SourceFile. Unreadable or missing files are simply absent from the result.
+    """
+    try:
+        # No check=True: ExifTool exits non-zero if any file fails but still reports the others
+        proc = subprocess.run(
+            ["exiftool", "-json", "-n", "-Rating", "-XMP:Rating", "-RatingPercent"] + paths,
+            capture_output=True, text=True
+        )
+        entries = _json_loads(proc.stdout) if proc.stdout else []
+    except Exception as e:
+        log(f"Failed to read ratings for {len(paths)} file(s): {e}", log_file, LogLevel.DEBUG)
+        return {}
+    return {
+        _path_key(entry["SourceFile"]): entry
+        for entry in entries
+        if isinstance(entry, dict) and entry.get("SourceFile")
+    }
+
+
+class SidecarIndex:
+    """
+    Lazily answers "does this .xmp sidecar exist?" with one directory listing per folder.
+
+    The first lookup in a directory lists it once with os.scandir and caches the names of
+    its *.xmp files; further assets in the same folder become set lookups instead of one
+    stat() each. Only folders that actually contain written assets are ever listed.
+    """
+    def __init__(self):
+        self._dirs: Dict[str, Optional[Set[str]]] = {}
+
+    def _scan(self, directory: str) -> Optional[Set[str]]:
+        try:
+            with os.scandir(directory) as entries:
+                return {os.path.normcase(e.name) for e in entries if e.name.lower().endswith(".xmp")}
+        except OSError:
+            # Unlistable directory: fall back to os.path.exists() for its files
+            return None
+
+    def __contains__(self, sidecar_path: str) -> bool:
+        directory, name = os.path.split(sidecar_path)
+        if directory not in self._dirs:
+            self._dirs[directory] = self._scan(directory)
+        names = self._dirs[directory]
+        if names is None:
+            return os.path.exists(sidecar_path)
+        return os.path.normcase(name) in names
+
+
 # overwride sidcar
-def execute_with_sidecar_and_msphoto(args: list, full_path: str, exif_tool_helper: ExifToolHelper, log_file: str) -> tuple:
+def execute_with_sidecar_and_msphoto(
+    args: list,
+    full_path: str,
+    exif_tool_helper: ExifToolHelper,
+    log_file: str,
+    sidecar_index: Optional[SidecarIndex] = None,
+) -> tuple:
     """
     Execute ExifTool write with sidecar-awareness and MicrosoftPhoto:Rating fallback.
 
     - If a .xmp sidecar exists it will be read and its previous rating logged.
     - JPG and sidecar are written together to keep metadata consistent.
     - If ExifTool reports MicrosoftPhoto:Rating not writable, retry without that tag.
+    - If sidecar_index (a SidecarIndex) is given, it replaces the os.path.exists() check.
     - Returns (stdout, stderr) combined from attempts.
     """
     targets = [full_path]
     sidecar_path = f"{full_path}.xmp"
-
-    # Read & log sidecar previous rating (if present) and add it to targets
-    if os.path.exists(sidecar_path):
-        try:
-            proc = subprocess.run(
-                ["exiftool", "-json", "-n", "-Rating", "-XMP:Rating", "-RatingPercent", sidecar_path],
-                capture_output=True, text=True, check=True
-            )
-            side_info = json.loads(proc.stdout)[0] if proc.stdout else {}
+    if sidecar_index is not None:
+        has_sidecar = sidecar_path in sidecar_index
+    else:
+        has_sidecar = os.path.exists(sidecar_path)
+
+    # Read previous ratings of the file [+ sidecar] with a single ExifTool call
+    read_paths = [sidecar_path, full_path] if has_sidecar else [full_path]
+    rating_info = read_rating_info(read_paths, log_file)
+
+    # Log sidecar previous rating (if present) and add it to targets
+    if has_sidecar:
+        side_info = rating_info.get(_path_key(sidecar_path))
+        if side_info is None:
+            log(f"Failed to read sidecar {sidecar_path}", log_file, LogLevel.DEBUG)
+        else:
             prev_rating = side_info.get("Rating", side_info.get("XMP:Rating", None))
             prev_percent = side_info.get("RatingPercent", None)
 
@@ -102,26 +188,16 @@ def execute_with_sidecar_and_msphoto(args: list, full_path: str, exif_tool_helpe
                 log(f"[SIDE-CAR] {sidecar_path} previous rating: (not set)", log_file, LogLevel.DEBUG)
 
             targets.append(sidecar_path)
-        except Exception as e:
-            log(f"Failed to read sidecar {sidecar_path}: {e}", log_file, LogLevel.DEBUG)
 
-    # Optional: read and log in-file previous rating for audit (debug level)
-    try:
-        proc_file = subprocess.run(
-            ["exiftool", "-json", "-n", "-Rating", "-XMP:Rating", "-RatingPercent", full_path],
-            capture_output=True, text=True, check=True
+    # Optional: log in-file previous rating for audit (debug level)
+    file_info = rating_info.get(_path_key(full_path), {})
+    file_prev_rating = file_info.get("Rating", file_info.get("XMP:Rating", None))
+    file_prev_percent = file_info.get("RatingPercent", None)
+    if file_prev_rating is not None or file_prev_percent is not None:
+        log(
+            f"[FILE-BEFORE] {full_path} previous rating: Rating={file_prev_rating} RatingPercent={file_prev_percent}",
+            log_file, LogLevel.DEBUG
         )
-        file_info = json.loads(proc_file.stdout)[0] if proc_file.stdout else {}
-        file_prev_rating = file_info.get("Rating", file_info.get("XMP:Rating", None))
-        file_prev_percent = file_info.get("RatingPercent", None)
-        if file_prev_rating is not None or file_prev_percent is not None:
-            log(
-                f"[FILE-BEFORE] {full_path} previous rating: Rating={file_prev_rating} RatingPercent={file_prev_percent}",
-                log_file, LogLevel.DEBUG
-            )
-    except Exception:
-        # ignore read failures here
-        pass
 
     # First write attempt (JPG [+ sidecar if present])
     stdout, stderr = exif_tool_helper.execute(args + targets)
@@ -129,7 +205,7 @@ def execute_with_sidecar_and_msphoto(args: list, full_path: str, exif_tool_helpe
 
     # If ExifTool complains about MicrosoftPhoto:Rating not writable, retry without that tag
     ms_tag = "MicrosoftPhoto:Rating"
-    if any(keyword in combined_out for keyword in ["MicrosoftPhoto:Rating", "MicrosoftPhoto:Rating' doesn't exist", "not writable", "Sorry"]):
+    if _MSPHOTO_WARN_RE.search(combined_out):
         # Filter out MicrosoftPhoto:Rating entries (they look like "-MicrosoftPhoto:Rating=...")
         filtered_args = [a for a in args if not a.startswith(f"-{ms_tag}")]
         log(f"[MSPHOTO] {full_path}: MicrosoftPhoto:Rating not writable; retrying without {ms_tag}", log_file, LogLevel.WARNING)
@@ -228,7 +304,7 @@ def get_current_exif_values(full_path: str, active_modes: List[str]) -> Dict[str
             check=True,
         )
         
-        data = json.loads(result.stdout)
+        data = _json_loads(result.stdout)
         if not data or not isinstance(data, list) or len(data) == 0:
             return {}
         
@@ -309,9 +385,9 @@ def normalize_exif_value(value: str, tag: str) -> str:
             except ValueError:
                 return match.group(0)
     
-    # Rating: extract digit
+    # Rating: extract digit (keeping the sign of -1 = rejected)
     if tag in ["Rating", "XMP:Rating", "MicrosoftPhoto:Rating"] or tag_short == "Rating":
-        match = re.search(r"\d", value)
+        match = re.search(r"-?\d", value)
         if match:
             return match.group(0)
 
@@ -417,6 +493,15 @@ def convert_bbox_to_mwg_rs(
     }
 
 
+# Filename date: YYYY[-_]MM[-_]DD, optionally followed by [-_]HH[-_]MM[[-_]SS]
+# (HHMM without seconds must not be followed by another digit).
+# Numeric ranges are constrained in the pattern so no separate sanity check is needed.
+_FILENAME_DATE_RE = re.compile(
+    r"(?P<y>19\d\d|20\d\d|2100)[\-_]?(?P<m>0[1-9]|1[0-2])[\-_]?(?P<d>0[1-9]|[12]\d|3[01])"
+    r"(?:[\-_](?P<H>[01]\d|2[0-3])[\-_]?(?P<M>[0-5]\d)(?:[\-_]?(?P<S>[0-5]\d)|(?!\d)))?"
+)
+
+
 def extract_date_from_filename(filename: str) -> Optional[datetime.datetime]:
     """Extract a date from a filename using common patterns.
 
@@ -427,53 +512,71 @@ def extract_date_from_filename(filename: str) -> Optional[datetime.datetime]:
         return None
     # Strip directory and extension
     basename = os.path.splitext(os.path.basename(filename))[0]
-    # Try various patterns in order of specificity
-    patterns = [
-        # YYYYMMDD_HHMMSS or YYYYMMDD-HHMMSS
-        (r"(\d{4})[\-_]?(\d{2})[\-_]?(\d{2})[\-_](\d{2})[\-_]?(\d{2})[\-_]?(\d{2})",
-         lambda m: datetime.datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)),
-                                     int(m.group(4)), int(m.group(5)), int(m.group(6)))),
-        # YYYYMMDD_HHMM (no seconds)
-        (r"(\d{4})[\-_]?(\d{2})[\-_]?(\d{2})[\-_](\d{2})[\-_]?(\d{2})(?!\d)",
-         lambda m: datetime.datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)),
-                                     int(m.group(4)), int(m.group(5)))),
-        # YYYY-MM-DD or YYYY_MM_DD or YYYYMMDD
-        (r"(\d{4})[\-_]?(\d{2})[\-_]?(\d{2})",
-         lambda m: datetime.datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)))),
-    ]
-    for pattern, builder in patterns:
-        match = re.search(pattern, basename)
-        if match:
-            try:
-                dt = builder(match)
-                # Basic sanity check
-                if 1900 <= dt.year <= 2100 and 1 <= dt.month <= 12 and 1 <= dt.day <= 31:
-                    return dt
-            except (ValueError, OverflowError):
-                continue
-    return None
+    match = _FILENAME_DATE_RE.search(basename)
+    if not match:
+        return None
+    hour, minute, second = match.group("H", "M", "S")
+    try:
+        return datetime.datetime(
+            int(match.group("y")), int(match.group("m")), int(match.group("d")),
+            int(hour or 0), int(minute or 0), int(second or 0),
+        )
+    except ValueError:
+        # e.g. February 30th
+        return None
 
 
 def _parse_datetime_str(date_str: str) -> Optional[datetime.datetime]:
     """Parse a datetime string tolerantly, returning a naive datetime or None."""
     if not date_str or not isinstance(date_str, str):
         return None
+    return _parse_datetime_str_cached(date_str)
+
+
+@lru_cache(maxsize=4096)
+def _parse_datetime_str_cached(date_str: str) -> Optional[datetime.datetime]:
+    """Memoized worker for _parse_datetime_str (timestamps repeat a lot, e.g. burst shots)."""
     date_str = date_str.strip()
     if not date_str:
         return None
 
-    # Try common ISO 8601 formats
-    for fmt in ["%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ",
-                "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S",
-                "%Y-%m-%d %H:%M:%S", "%Y:%m:%d %H:%M:%S"]:
-        try:
-            return datetime.datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
+    # Fast path: fixed-width "YYYY-MM-DDTHH:MM:SS" (ISO 8601) or "YYYY:MM:DD HH:MM:SS" (EXIF),
+    # optionally followed by fractional seconds and a "Z" / "+HH:MM" suffix (dropped, result is naive)
+    if (
+        len(date_str) >= 19
+        and date_str[4] == date_str[7]
+        and date_str[4] in "-:"
+        and date_str[10] in "T "
+        and date_str[13] == ":"
+        and date_str[16] == ":"
+    ):
+        digits = date_str[0:4] + date_str[5:7] + date_str[8:10] + date_str[11:13] + date_str[14:16] + date_str[17:19]
+        rest = date_str[19:]
+        microsecond = 0
+        if rest[:1] == ".":
+            end = 1
+            while end < len(rest) and rest[end].isdigit():
+                end += 1
+            fraction = rest[1:end]
+            microsecond = int(fraction[:6].ljust(6, "0")) if fraction else -1
+            rest = rest[end:]
+        if (
+            digits.isdigit()
+            and microsecond >= 0
+            and (not rest or rest == "Z" or (rest[0] in "+-" and len(rest) in (5, 6)))
+        ):
+            try:
+                return datetime.datetime(
+                    int(digits[0:4]), int(digits[4:6]), int(digits[6:8]),
+                    int(digits[8:10]), int(digits[10:12]), int(digits[12:14]),
+                    microsecond,
+                )
+            except ValueError:
+                return None
 
-    # Fallback: strip timezone offsets and try fromisoformat
+    # Fallback: strip a trailing "Z" / timezone offset and try fromisoformat
     try:
-        clean_str = date_str.replace("Z", "")
+        clean_str = date_str[:-1] if date_str[-1] == "Z" else date_str
         clean_str = re.sub(r"[+-]\d{2}:?\d{2}$", "", clean_str)
         return datetime.datetime.fromisoformat(clean_str)
     except (ValueError, AttributeError):
@@ -496,23 +599,24 @@ def select_oldest_date_from_asset(asset: Dict[str, Any], log_file: str = DEFAULT
     details = asset if "exifInfo" in asset else {}
     exif = details.get("exifInfo", {}) or {}
 
-    candidates: List[Tuple[str, Optional[str]]] = [
+    candidates: Tuple[Tuple[str, Optional[str]], ...] = (
         ("exifInfo.dateTimeOriginal", exif.get("dateTimeOriginal")),
         ("exifInfo.dateTimeCreated", exif.get("dateTimeCreated")),
         ("exifInfo.modifyDate", exif.get("modifyDate")),
         ("fileCreatedAt", asset.get("fileCreatedAt") or details.get("fileCreatedAt")),
         ("fileModifiedAt", asset.get("fileModifiedAt") or details.get("fileModifiedAt")),
-    ]
+    )
 
-    valid_dates: List[Tuple[str, datetime.datetime]] = []
+    # Single pass keeping the running minimum (first source wins on ties)
+    oldest: Optional[datetime.datetime] = None
+    source = ""
     for source_name, raw_value in candidates:
         if raw_value:
             parsed = _parse_datetime_str(str(raw_value))
-            if parsed:
-                valid_dates.append((source_name, parsed))
+            if parsed and (oldest is None or parsed < oldest):
+                oldest, source = parsed, source_name
 
-    if valid_dates:
-        source, oldest = min(valid_dates, key=lambda x: x[1])
+    if oldest is not None:
         log(f"Selected date from {source}: {oldest.isoformat()}", log_file, LogLevel.DEBUG)
         return oldest
 
@@ -529,21 +633,57 @@ def select_oldest_date_from_asset(asset: Dict[str, Any], log_file: str = DEFAULT
     return None
 
 
+# Timestamp tags written by the time sync (EXIF, XMP, IPTC, QuickTime, file system).
+# Placeholders: exif="YYYY:MM:DD HH:MM:SS", date="YYYY-MM-DD", time="HH:MM:SS", iso="YYYY-MM-DDTHH:MM:SS"
+_TIME_ARG_TEMPLATES = (
+    "-AllDates={exif}",
+    "-XMP:CreateDate={exif}",
+    "-XMP:ModifyDate={exif}",
+    "-XMP:MetadataDate={exif}",
+    "-IPTC:DateCreated={date}",
+    "-IPTC:TimeCreated={time}",
+    "-QuickTime:CreateDate={iso}",
+    "-QuickTime:ModifyDate={iso}",
+    "-FileCreateDate={iso}",
+    "-FileModifyDate={iso}",
+    "-XMP-photoshop:DateCreated={date}",
+)
+
+# Star rating (-1 = rejected, 0-5 stars) -> complete ExifTool rating arguments.
+# Only seven combinations exist, so every asset reuses the same interned strings.
+# Rejected keeps -1 in the XMP/EXIF rating; MicrosoftPhoto:Rating and RatingPercent have no
+# "rejected" value and are written as 0 (unrated) instead of a negative percentage.
+_RATING_ARGS = {
+    stars: tuple(sys.intern(arg) for arg in (
+        f"-XMP:Rating={stars}",
+        f"-MicrosoftPhoto:Rating={max(stars, 0)}",
+        f"-Rating={stars}",
+        f"-RatingPercent={max(stars, 0) * 20}",
+    ))
+    for stars in range(-1, 6)
+}
+_FAVORITE_ARGS = ("-XMP:Label=Favorite", "-XMP:Favorite=1")
+_NOT_FAVORITE_ARGS = ("-XMP:Label=", "-XMP:Favorite=0")
+
+
 def build_exif_args(
     asset: Dict[str, Any],
     details: Dict[str, Any],
     active_modes: List[str],
     caption_max_len: int = DEFAULT_CAPTION_MAX_LEN,
     album_map: Optional[Dict[str, List[str]]] = None,
-) -> Tuple[List[str], List[str]]:
+) -> Tuple[List[str], Set[str]]:
     """Build ExifTool arguments based on selected modes. Populates XMP (modern) and IPTC fields simultaneously."""
     args: List[str] = []
-    changes: List[str] = []
+    changes: Set[str] = set()
     exif = details.get("exifInfo", {}) or {}
+    people_data = details.get("people") or []
+    # Mode membership is tested up to seven times per asset
+    modes = active_modes if isinstance(active_modes, (set, frozenset)) else set(active_modes)
 
     # 1. PEOPLE SYNC (face recognition)
-    if "people" in active_modes:
-        people = [p["name"] for p in details.get("people", []) if p.get("name")]
+    if "people" in modes:
+        people = [p["name"] for p in people_data if p.get("name")]
         if people:
             # Sortiere Namen alphabetisch für konsistente Reihenfolge
             people_sorted = sorted(people)
@@ -553,27 +693,27 @@ def build_exif_args(
                 f"-IPTC:Keywords={val}",
                 f"-XMP-iptcExt:PersonInImage={val}"  # ← NEW: IPTC Extension standard
             ])
-            changes.append("People")
+            changes.add("People")
 
     # 2. LOCATION SYNC (GPS & altitude)
-    if "gps" in active_modes:
+    if "gps" in modes:
         lat, lon = exif.get("latitude"), exif.get("longitude")
         if lat is not None and lon is not None:
             alt = exif.get("altitude", 0) or 0
             args.extend([f"-GPSLatitude={lat}", f"-GPSLongitude={lon}", f"-GPSAltitude={alt}"])
-            changes.append("GPS")
+            changes.add("GPS")
 
     # 3. CAPTION SYNC
-    if "caption" in active_modes:
+    if "caption" in modes:
         cap = exif.get("description")
         if cap:
             safe_limit = normalize_caption_limit(caption_max_len)
             clean_cap = str(cap).replace("\n", " ").strip()[:safe_limit]
             args.extend([f"-XMP:Description={clean_cap}", f"-IPTC:Caption-Abstract={clean_cap}"])
-            changes.append("Caption")
+            changes.add("Caption")
 
     # 4. TIME SYNC (deterministic oldest-date selection and broad timestamp writing)
-    if "time" in active_modes:
+    if "time" in modes:
         # Combine asset-level and detail-level data for select_oldest_date_from_asset
         combined = {**asset}
         combined["exifInfo"] = exif
@@ -589,28 +729,20 @@ def build_exif_args(
         parsed_date = select_oldest_date_from_asset(combined)
 
         if parsed_date:
-            # Format to EXIF: YYYY:MM:DD HH:MM:SS (no timezone)
-            clean_date = parsed_date.strftime("%Y:%m:%d %H:%M:%S")
-            iso_date = parsed_date.strftime("%Y-%m-%d")
-            iso_time = parsed_date.strftime("%H:%M:%S")
-            iso_datetime = parsed_date.strftime("%Y-%m-%dT%H:%M:%S")
-            args.extend([
-                f"-AllDates={clean_date}",
-                f"-XMP:CreateDate={clean_date}",
-                f"-XMP:ModifyDate={clean_date}",
-                f"-XMP:MetadataDate={clean_date}",
-                f"-IPTC:DateCreated={iso_date}",
-                f"-IPTC:TimeCreated={iso_time}",
-                f"-QuickTime:CreateDate={iso_datetime}",
-                f"-QuickTime:ModifyDate={iso_datetime}",
-                f"-FileCreateDate={iso_datetime}",
-                f"-FileModifyDate={iso_datetime}",
-                f"-XMP-photoshop:DateCreated={iso_date}",
-            ])
-            changes.append("Time")
+            # Fixed ASCII formats, built directly instead of via strftime (no timezone)
+            iso_date = f"{parsed_date.year:04d}-{parsed_date.month:02d}-{parsed_date.day:02d}"
+            iso_time = f"{parsed_date.hour:02d}:{parsed_date.minute:02d}:{parsed_date.second:02d}"
+            iso_datetime = f"{iso_date}T{iso_time}"
+            # EXIF: YYYY:MM:DD HH:MM:SS
+            clean_date = f"{iso_date.replace('-', ':')} {iso_time}"
+            args.extend(
+                template.format(exif=clean_date, date=iso_date, time=iso_time, iso=iso_datetime)
+                for template in _TIME_ARG_TEMPLATES
+            )
+            changes.add("Time")
 
     # 5. RATING & FAVORITE SYNC (independent tracking)
-    if "rating" in active_modes:
+    if "rating" in modes:
         # Star rating: from exifInfo.rating or asset.rating, fallback favorite → 5
         star_rating = exif.get("rating")
         if star_rating is None:
@@ -637,13 +769,9 @@ def build_exif_args(
         else:
             star_rating = 0
 
-        rating_percent = star_rating * 20
-        args.extend([
-            f"-XMP:Rating={star_rating}",
-            f"-MicrosoftPhoto:Rating={star_rating}",
-            f"-Rating={star_rating}",
-            f"-RatingPercent={rating_percent}",
-        ])
+        # Clamp to the xmp:Rating range (-1 = rejected .. 5) and reuse the prebuilt argument strings
+        star_rating = max(-1, min(5, star_rating))
+        args.extend(_RATING_ARGS[star_rating])
 
         # Favorite: only SET the label when favorite
         # Note: We don't delete Label when not favorite because:
@@ -652,17 +780,17 @@ def build_exif_args(
         # 3. This prevents update loops when Label can't be removed
 
         if is_favorite:
-            args.extend(["-XMP:Label=Favorite", "-XMP:Favorite=1"])
-            changes.append("Label")
+            args.extend(_FAVORITE_ARGS)
+            changes.add("Label")
         else:
             # Wenn kein Favorit: Label löschen und Favorite auf 0 setzen
-            args.extend(["-XMP:Label=", "-XMP:Favorite=0"])
-            changes.append("Label")
+            args.extend(_NOT_FAVORITE_ARGS)
+            changes.add("Label")
 
-        changes.append("Rating")
+        changes.add("Rating")
 
     # 6. ALBUM SYNC (new section after rating)
-    if "albums" in active_modes and album_map:
+    if "albums" in modes and album_map:
         album_names = album_map.get(asset.get("id"), [])
         if album_names:
             # Primary album as Event
@@ -675,11 +803,10 @@ def build_exif_args(
             # NEW: Write album names to EXIF:UserComment (for Windows Comments)
             args.append(f"-EXIF:UserComment={','.join(album_names)}")
             
-            changes.append("Albums")
+            changes.add("Albums")
 
     # 7. FACE COORDINATES SYNC (MWG-RS regions)
-    if "face-coordinates" in active_modes:
-        people_data = details.get("people", [])
+    if "face-coordinates" in modes:
         region_found = False
         
         region_list = [] # For the virtual comparison tag
@@ -731,6 +858,6 @@ def build_exif_args(
             # The virtual tag: Used by extract_desired_values, but filtered out in execute()
             regions = {"AppliedToDimensions": dims, "RegionList": region_list}
             args.append(f"-RegionInfo={json.dumps(regions)}")
-            changes.append("FaceCoordinates")
+            changes.add("FaceCoordinates")
 
     return args, changes
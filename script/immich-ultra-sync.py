@@ -7,6 +7,7 @@ Immich API and writing it to EXIF/XMP tags in media files.
 """
 
 import argparse
+from functools import lru_cache
 import os
 from pathlib import Path
 import signal
@@ -14,7 +15,9 @@ import sys
 from typing import Any, Dict, List, Optional, Tuple
 
 # Add script directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, _SCRIPT_DIR)
 
 # Import from local modules
 from utils import (
@@ -35,7 +38,7 @@ from api import (
 from exif import (
     ExifToolHelper, check_exiftool,
     build_exif_args, get_current_exif_values, extract_desired_values, normalize_exif_value,
-    execute_with_sidecar_and_msphoto
+    execute_with_sidecar_and_msphoto, SidecarIndex
 )
 
 # ==============================================================================
@@ -63,6 +66,7 @@ def process_asset(
     log_file: str,
     exiftool: ExifToolHelper,
     album_map: Optional[Dict[str, List[str]]] = None,
+    sidecar_index: Optional[SidecarIndex] = None,
 ) -> Optional[str]:
     """Process a single asset and return a statistics key for the outcome."""
     if not details:
@@ -145,7 +149,9 @@ def process_asset(
         log(f"UPDATE: {clean_rel} - Changing: {', '.join(fields_to_update)}", log_file, LogLevel.INFO)
 
         # Use the sidecar-aware executor which also retries without MicrosoftPhoto:Rating if necessary
-        stdout, stderr = execute_with_sidecar_and_msphoto(["-overwrite_original"] + exif_args, full_path, exiftool, log_file)
+        stdout, stderr = execute_with_sidecar_and_msphoto(
+            ["-overwrite_original"] + exif_args, full_path, exiftool, log_file, sidecar_index
+        )
 
         # exiftool.execute returned combined stdout/stderr (or from retry)
         combined = (stdout or "") + (stderr or "")
@@ -188,9 +194,15 @@ def create_arg_parser() -> argparse.ArgumentParser:
     return parser
 
 
+@lru_cache(maxsize=1)
+def _get_arg_parser() -> argparse.ArgumentParser:
+    """Return a process-wide parser instance (parsing does not mutate it)."""
+    return create_arg_parser()
+
+
 def parse_cli_args(argv: Optional[List[str]] = None) -> Tuple[argparse.Namespace, List[str]]:
     """Parse CLI arguments and derive active modes."""
-    parser = create_arg_parser()
+    parser = _get_arg_parser()
     args = parser.parse_args(argv)
     # Note: 'albums' is explicitly opt-in and not included in --all by default
     modes = ["people", "gps", "caption", "time", "rating"]
@@ -278,6 +290,9 @@ def main() -> None:
 
     dry_run = args.dry_run
     only_new = args.only_new
+
+    # List each written asset's folder once for .xmp sidecars instead of stat()ing one path per asset
+    sidecar_index = None if dry_run else SidecarIndex()
     
     # Load checkpoint if resuming
     processed_ids = load_checkpoint(log_file) if args.resume else set()
@@ -385,6 +400,7 @@ def main() -> None:
                 log_file,
                 exiftool,
                 album_map,
+                sidecar_index,
             )
             if status_key and status_key in statistics:
                 statistics[status_key] += 1
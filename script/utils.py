@@ -35,6 +35,8 @@ LOCK_SIZE = 1  # Minimal lock size required by msvcrt.locking
 # ==============================================================================
 DEFAULT_PHOTO_DIR = "/library"
 DEFAULT_LOG_FILE = "immich_ultra_sync.txt"
+DEFAULT_LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate the log file at this size (0 disables rotation)
+DEFAULT_LOG_BACKUP_COUNT = 3  # Rotated files kept as <log>.1 .. <log>.N
 DEFAULT_PATH_SEGMENTS = 3
 MAX_PATH_SEGMENTS = 10  # Upper bound balances flexibility with security to avoid extreme depth abuse; typical date/album trees sit well below this
 DEFAULT_BATCH_SIZE = 25
@@ -79,6 +81,11 @@ def get_env_int(name: str, default: int) -> int:
         return default
 
 
+# Log rotation settings, read once at import instead of on every log() call
+LOG_MAX_BYTES = get_env_int("IMMICH_LOG_MAX_BYTES", DEFAULT_LOG_MAX_BYTES)
+LOG_BACKUP_COUNT = get_env_int("IMMICH_LOG_BACKUP_COUNT", DEFAULT_LOG_BACKUP_COUNT)
+
+
 def normalize_caption_limit(value: int) -> int:
     """Ensure caption limit respects the configured minimum."""
     return max(MIN_CAPTION_MAX_LEN, value)
@@ -127,12 +134,38 @@ def log(message: str, log_file: str = DEFAULT_LOG_FILE, level: LogLevel = LogLev
 
     print(msg, flush=True)
     try:
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
+        _append_log_line(log_file, msg + "\n")
     except (IOError, OSError) as e:
         print(f"Logging error: {e}")
 
 
+def _rotate_log(log_file: str, backup_count: int) -> None:
+    """Shift log_file to log_file.1 (and older backups up by one), dropping the oldest."""
+    if backup_count <= 0:
+        os.remove(log_file)
+        return
+    for i in range(backup_count - 1, 0, -1):
+        src = f"{log_file}.{i}"
+        if os.path.exists(src):
+            os.replace(src, f"{log_file}.{i + 1}")
+    os.replace(log_file, f"{log_file}.1")
+
+
+def _append_log_line(log_file: str, line: str) -> None:
+    """Append line to log_file, rotating it first when it would exceed LOG_MAX_BYTES."""
+    data = line.encode("utf-8")
+    f = open(log_file, "ab")
+    try:
+        # In append mode the position starts at the end, so tell() is the current file size
+        if LOG_MAX_BYTES > 0 and 0 < f.tell() and f.tell() + len(data) > LOG_MAX_BYTES:
+            f.close()
+            _rotate_log(log_file, LOG_BACKUP_COUNT)
+            f = open(log_file, "ab")
+        f.write(data)
+    finally:
+        f.close()
+
+
 def retry_on_failure(max_retries: int = 3, delay: float = 2.0):
     """Decorator to retry function calls on failure with exponential backoff."""
     from functools import wraps
@@ -540,8 +573,11 @@ def validate_photo_directory(photo_dir: str, log_file: str) -> bool:
     Returns True if valid, False if issues detected.
     Logs helpful hints for common configuration problems.
     """
-    # Check if directory exists
-    if not os.path.exists(photo_dir):
+    # A single scandir() covers existence, type and emptiness (first dirent only, no full listing)
+    try:
+        with os.scandir(photo_dir) as it:
+            first_entry = next(it, None)
+    except FileNotFoundError:
         log(f"ERROR: Photo directory does not exist: {photo_dir}", log_file, LogLevel.ERROR)
         log(
             f"HINT: Check if IMMICH_PHOTO_DIR is correctly set and matches the Docker mount point.",
@@ -554,28 +590,9 @@ def validate_photo_directory(photo_dir: str, log_file: str) -> bool:
             LogLevel.ERROR
         )
         return False
-    
-    # Check if directory is actually a directory
-    if not os.path.isdir(photo_dir):
+    except NotADirectoryError:
         log(f"ERROR: Photo directory path exists but is not a directory: {photo_dir}", log_file, LogLevel.ERROR)
         return False
-    
-    # Check if directory is empty (potential mount issue)
-    try:
-        contents = os.listdir(photo_dir)
-        if not contents:
-            log(f"WARNING: Photo directory is empty: {photo_dir}", log_file, LogLevel.WARNING)
-            log(
-                f"HINT: This might indicate a mount problem. Verify that your library is properly mounted in the container.",
-                log_file,
-                LogLevel.WARNING
-            )
-            log(
-                f"HINT: Check Docker volume configuration and ensure the host path contains your photo library.",
-                log_file,
-                LogLevel.WARNING
-            )
-            return False
     except PermissionError:
         log(f"ERROR: No permission to read photo directory: {photo_dir}", log_file, LogLevel.ERROR)
         log(f"HINT: Check file permissions and ensure the container user has read access.", log_file, LogLevel.ERROR)
@@ -587,8 +604,23 @@ def validate_photo_directory(photo_dir: str, log_file: str) -> bool:
     except Exception as e:
         log(f"ERROR: Failed to check photo directory contents: {e}", log_file, LogLevel.ERROR)
         return False
-    
-    log(f"Photo directory validated: {photo_dir} ({len(contents)} items)", log_file, LogLevel.INFO)
+
+    # Check if directory is empty (potential mount issue)
+    if first_entry is None:
+        log(f"WARNING: Photo directory is empty: {photo_dir}", log_file, LogLevel.WARNING)
+        log(
+            f"HINT: This might indicate a mount problem. Verify that your library is properly mounted in the container.",
+            log_file,
+            LogLevel.WARNING
+        )
+        log(
+            f"HINT: Check Docker volume configuration and ensure the host path contains your photo library.",
+            log_file,
+            LogLevel.WARNING
+        )
+        return False
+
+    log(f"Photo directory validated: {photo_dir} (not empty)", log_file, LogLevel.INFO)
     return True
 
 
@@ -604,12 +636,10 @@ def check_mount_issues(statistics: dict, log_file: str, photo_dir: str, path_seg
     if total == 0:
         return
     
-    # Calculate percentages
-    file_not_found_pct = (file_not_found / total) * 100
-    path_mismatch_pct = (path_segment_mismatch / total) * 100
-    
+    # Thresholds are compared with integer arithmetic; percentages are only computed for logging
     # Check for high rate of file-not-found errors (>90%)
-    if file_not_found_pct > 90:
+    if file_not_found * 10 > total * 9:
+        file_not_found_pct = (file_not_found / total) * 100
         log(
             f"WARNING: {file_not_found_pct:.1f}% of assets ({file_not_found}/{total}) were skipped due to files not being found.",
             log_file,
@@ -645,7 +675,8 @@ def check_mount_issues(statistics: dict, log_file: str, photo_dir: str, path_seg
             log_file,
             LogLevel.WARNING
         )
-    elif file_not_found_pct > 50:
+    elif file_not_found * 2 > total:
+        file_not_found_pct = (file_not_found / total) * 100
         log(
             f"WARNING: {file_not_found_pct:.1f}% of assets ({file_not_found}/{total}) were not found.",
             log_file,
@@ -658,7 +689,8 @@ def check_mount_issues(statistics: dict, log_file: str, photo_dir: str, path_seg
         )
     
     # Check for high rate of path segment mismatches (>50%)
-    if path_mismatch_pct > 50:
+    if path_segment_mismatch * 2 > total:
+        path_mismatch_pct = (path_segment_mismatch / total) * 100
         log(
             f"WARNING: {path_mismatch_pct:.1f}% of assets ({path_segment_mismatch}/{total}) have path segment mismatches.",
             log_file,
@@ -1,99 +1,117 @@
 import sys
 import os
 import json
+import shutil
+import stat
 import tempfile
+import types
 from pathlib import Path
 import unittest
+from unittest import mock
 
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 SCRIPT_DIR = PROJECT_ROOT / "script"
 
-# Add script directory to path
-sys.path.insert(0, str(SCRIPT_DIR))
+# Add script directory to path (only once, even if several test modules import this)
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
 
 # Import modules
 import utils
 import exif
 import api
 
-# Import main script functions
+# Import main script functions (cached in sys.modules so it is executed only once per session)
 import importlib.util
-spec = importlib.util.spec_from_file_location("immich_ultra_sync_main", SCRIPT_DIR / "immich-ultra-sync.py")
-if spec is None or spec.loader is None:
-    raise ImportError(f"Unable to load module from {SCRIPT_DIR / 'immich-ultra-sync.py'}")
-main_module = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(main_module)
+if "immich_ultra_sync_main" in sys.modules:
+    main_module = sys.modules["immich_ultra_sync_main"]
+else:
+    spec = importlib.util.spec_from_file_location("immich_ultra_sync_main", SCRIPT_DIR / "immich-ultra-sync.py")
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Unable to load module from {SCRIPT_DIR / 'immich-ultra-sync.py'}")
+    main_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(main_module)
+    sys.modules["immich_ultra_sync_main"] = main_module
+
+
+# Combine all submodules into one namespace, built once per test run
+# (later modules win on name clashes; private attributes are copied too)
+_COMBINED = types.SimpleNamespace()
+for _source in (utils, exif, api, main_module):
+    _COMBINED.__dict__.update(
+        {k: v for k, v in vars(_source).items() if not k.startswith('__')}
+    )
+
+
+def _args_to_map(args):
+    """Map ExifTool "-TAG=VALUE" arguments to {TAG: VALUE}; flags without "=" are ignored."""
+    return dict(a[1:].split("=", 1) for a in args if a.startswith("-") and "=" in a)
+
+
+def _face(name, x1, y1, x2, y2, width=4000, height=3000):
+    """Build an Immich person entry with a single face bounding box."""
+    return {
+        "name": name,
+        "faces": [
+            {
+                "boundingBoxX1": x1,
+                "boundingBoxY1": y1,
+                "boundingBoxX2": x2,
+                "boundingBoxY2": y2,
+                "imageWidth": width,
+                "imageHeight": height,
+            }
+        ],
+    }
 
 
 class ModuleLoaderMixin(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
-        # Create a mock module that combines all submodules
-        class CombinedModule:
-            pass
-        
-        module = CombinedModule()
-        # Copy attributes from utils (including private ones for testing)
-        for attr in dir(utils):
-            if not attr.startswith('__'):  # Copy private attributes too
-                setattr(module, attr, getattr(utils, attr))
-        # Copy attributes from exif
-        for attr in dir(exif):
-            if not attr.startswith('__'):
-                setattr(module, attr, getattr(exif, attr))
-        # Copy attributes from api
-        for attr in dir(api):
-            if not attr.startswith('__'):
-                setattr(module, attr, getattr(api, attr))
-        # Copy attributes from main module
-        for attr in dir(main_module):
-            if not attr.startswith('__'):
-                setattr(module, attr, getattr(main_module, attr))
-        
-        cls.module = module
+        cls.module = _COMBINED
+        # Frequently asserted constants, bound once to skip the namespace lookup
+        cls.MIN_CAP = _COMBINED.MIN_CAPTION_MAX_LEN
+        cls.DEFAULT_CAP = _COMBINED.DEFAULT_CAPTION_MAX_LEN
+        cls.LogLevel = _COMBINED.LogLevel
 
 
 class BuildExifArgsTests(ModuleLoaderMixin):
+    _ASSET = types.MappingProxyType({"isFavorite": False})
+    _ASSET_FAVORITE = types.MappingProxyType({"isFavorite": True})
+
     def test_caption_respects_max_length(self):
         long_caption = "a" * 2100
-        asset = {"isFavorite": False}
         details = {"exifInfo": {"description": long_caption}}
 
-        args, changes = self.module.build_exif_args(asset, details, ["caption"], caption_max_len=50)
+        args, changes = self.module.build_exif_args(self._ASSET, details, ["caption"], caption_max_len=50)
 
-        desc_arg = next(a for a in args if a.startswith("-XMP:Description="))
-        value = desc_arg.split("=", 1)[1]
+        value = _args_to_map(args)["XMP:Description"]
         self.assertEqual(len(value), 50)
         self.assertIn("Caption", changes)
 
     def test_caption_limit_has_minimum(self):
-        asset = {"isFavorite": False}
         details = {"exifInfo": {"description": "abcd"}}
 
-        args, _ = self.module.build_exif_args(asset, details, ["caption"], caption_max_len=0)
+        args, _ = self.module.build_exif_args(self._ASSET, details, ["caption"], caption_max_len=0)
 
-        desc_arg = next(a for a in args if a.startswith("-XMP:Description="))
-        value = desc_arg.split("=", 1)[1]
-        self.assertEqual(len(value), self.module.MIN_CAPTION_MAX_LEN)
-        self.assertEqual(value, "abcd"[: self.module.MIN_CAPTION_MAX_LEN])
+        value = _args_to_map(args)["XMP:Description"]
+        self.assertEqual(len(value), self.MIN_CAP)
+        self.assertEqual(value, "abcd"[: self.MIN_CAP])
 
     def test_default_caption_limit_used(self):
         long_caption = "b" * 2101
-        asset = {"isFavorite": False}
         details = {"exifInfo": {"description": long_caption}}
 
-        args, _ = self.module.build_exif_args(asset, details, ["caption"])
+        args, _ = self.module.build_exif_args(self._ASSET, details, ["caption"])
 
-        desc_arg = next(a for a in args if a.startswith("-XMP:Description="))
-        value = desc_arg.split("=", 1)[1]
-        self.assertEqual(len(value), self.module.DEFAULT_CAPTION_MAX_LEN)
+        value = _args_to_map(args)["XMP:Description"]
+        self.assertEqual(len(value), self.DEFAULT_CAP)
 
     def test_people_and_rating_are_mapped(self):
-        asset = {"isFavorite": True}
         details = {"people": [{"name": "Alice"}, {"name": "Bob"}], "exifInfo": {}}
 
-        args, changes = self.module.build_exif_args(asset, details, ["people", "rating"])
+        args, changes = self.module.build_exif_args(self._ASSET_FAVORITE, details, ["people", "rating"])
 
         self.assertIn("People", changes)
         self.assertIn("-Rating=5", args)
@@ -119,79 +137,46 @@ class ChangeDetectionTests(ModuleLoaderMixin):
         self.assertEqual(desired["GPSLatitude"], "51.5")
         self.assertEqual(desired["GPSLongitude"], "-0.1")
 
-    def test_normalize_exif_value_gps(self):
-        # Test GPS coordinate normalization
-        self.assertEqual(
-            self.module.normalize_exif_value("51 deg 30' 15.00\" N", "GPSLatitude"),
-            "51.0"
-        )
-        self.assertEqual(
-            self.module.normalize_exif_value("51.504167", "GPSLatitude"),
-            "51.504167"
-        )
-        self.assertEqual(
-            self.module.normalize_exif_value("-0.127758", "GPSLongitude"),
-            "-0.127758"
-        )
-
-    def test_normalize_exif_value_altitude(self):
-        # Test altitude normalization
-        self.assertEqual(
-            self.module.normalize_exif_value("123.5", "GPSAltitude"),
-            "123.5"
-        )
-        self.assertEqual(
-            self.module.normalize_exif_value("0 m", "GPSAltitude"),
-            "0"
-        )
-        self.assertEqual(
-            self.module.normalize_exif_value("0", "GPSAltitude"),
-            "0"
-        )
-
-    def test_normalize_exif_value_rating(self):
-        # Test rating normalization
-        self.assertEqual(self.module.normalize_exif_value("5", "Rating"), "5")
-        self.assertEqual(self.module.normalize_exif_value("0", "Rating"), "0")
-
-    def test_normalize_exif_value_datetime(self):
-        # Test datetime normalization
-        self.assertEqual(
-            self.module.normalize_exif_value("2024:01:15 10:30:45", "DateTimeOriginal"),
-            "2024:01:15 10:30:45"
-        )
-        self.assertEqual(
-            self.module.normalize_exif_value("2024-01-15T10:30:45Z", "DateTimeOriginal"),
-            "2024:01:15 10:30:45"
-        )
-        self.assertEqual(
-            self.module.normalize_exif_value("2024-01-15 10:30:45", "CreateDate"),
-            "2024:01:15 10:30:45"
-        )
-        # Test XMP:CreateDate normalization (same format as DateTimeOriginal/CreateDate)
-        self.assertEqual(
-            self.module.normalize_exif_value("2024:01:15 10:30:45", "XMP:CreateDate"),
-            "2024:01:15 10:30:45"
-        )
-        self.assertEqual(
-            self.module.normalize_exif_value("2024-01-15T10:30:45Z", "XMP:CreateDate"),
-            "2024:01:15 10:30:45"
-        )
-        # Test XMP-photoshop:DateCreated normalization (ISO date format YYYY-MM-DD)
-        self.assertEqual(
-            self.module.normalize_exif_value("2024-01-15", "Photoshop:DateCreated"),
-            "2024-01-15"
-        )
-        self.assertEqual(
-            self.module.normalize_exif_value("2024:01:15", "Photoshop:DateCreated"),
-            "2024-01-15"
-        )
-
+    # (raw value, tag, expected normalized value)
+    _NORMALIZE_CASES = (
+        # GPS coordinates
+        ("51 deg 30' 15.00\" N", "GPSLatitude", "51.0"),
+        ("51.504167", "GPSLatitude", "51.504167"),
+        ("-0.127758", "GPSLongitude", "-0.127758"),
+        # Altitude
+        ("123.5", "GPSAltitude", "123.5"),
+        ("0 m", "GPSAltitude", "0"),
+        ("0", "GPSAltitude", "0"),
+        # Rating
+        ("5", "Rating", "5"),
+        ("0", "Rating", "0"),
+        # Datetime
+        ("2024:01:15 10:30:45", "DateTimeOriginal", "2024:01:15 10:30:45"),
+        ("2024-01-15T10:30:45Z", "DateTimeOriginal", "2024:01:15 10:30:45"),
+        ("2024-01-15 10:30:45", "CreateDate", "2024:01:15 10:30:45"),
+        # XMP:CreateDate (same format as DateTimeOriginal/CreateDate)
+        ("2024:01:15 10:30:45", "XMP:CreateDate", "2024:01:15 10:30:45"),
+        ("2024-01-15T10:30:45Z", "XMP:CreateDate", "2024:01:15 10:30:45"),
+        # XMP-photoshop:DateCreated (ISO date format YYYY-MM-DD)
+        ("2024-01-15", "Photoshop:DateCreated", "2024-01-15"),
+        ("2024:01:15", "Photoshop:DateCreated", "2024-01-15"),
+    )
+
+    def test_normalize_exif_value(self):
+        for value, tag, expected in self._NORMALIZE_CASES:
+            with self.subTest(tag=tag, value=value):
+                self.assertEqual(self.module.normalize_exif_value(value, tag), expected)
 
 
 class ArgparseTests(ModuleLoaderMixin):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Shared by several tests; parse once per class
+        cls._parsed_all = cls.module.parse_cli_args(["--all"])
+
     def test_parse_all_sets_all_modes(self):
-        parsed, modes = self.module.parse_cli_args(["--all"])
+        parsed, modes = self._parsed_all
         self.assertTrue(parsed.all)
         # Note: --all does NOT include albums - albums must be explicitly enabled
         self.assertEqual(set(modes), {"people", "gps", "caption", "time", "rating"})
@@ -200,36 +185,41 @@ class ArgparseTests(ModuleLoaderMixin):
         with self.assertRaises(SystemExit):
             self.module.parse_cli_args([])
     
-    def test_log_level_default(self):
-        parsed, modes = self.module.parse_cli_args(["--all"])
-        self.assertEqual(parsed.log_level, "INFO")
-    
-    def test_log_level_custom(self):
-        parsed, modes = self.module.parse_cli_args(["--all", "--log-level", "DEBUG"])
-        self.assertEqual(parsed.log_level, "DEBUG")
-    
-    def test_resume_flag(self):
-        parsed, modes = self.module.parse_cli_args(["--all", "--resume"])
-        self.assertTrue(parsed.resume)
-    
-    def test_export_stats_flag(self):
-        parsed, modes = self.module.parse_cli_args(["--all", "--export-stats", "json"])
-        self.assertEqual(parsed.export_stats, "json")
-    
-    def test_albums_flag(self):
-        parsed, modes = self.module.parse_cli_args(["--albums"])
-        self.assertTrue(parsed.albums)
-        self.assertIn("albums", modes)
-    
-    def test_all_with_albums_flag(self):
-        parsed, modes = self.module.parse_cli_args(["--all", "--albums"])
-        self.assertTrue(parsed.all)
-        self.assertTrue(parsed.albums)
+    # (argv, parsed attribute, expected value)
+    _OPTION_CASES = (
+        (["--all"], "log_level", "INFO"),
+        (["--all", "--log-level", "DEBUG"], "log_level", "DEBUG"),
+        (["--all", "--resume"], "resume", True),
+        (["--all", "--export-stats", "json"], "export_stats", "json"),
+        (["--albums"], "albums", True),
+        (["--all", "--albums"], "all", True),
+        (["--all", "--albums"], "albums", True),
+    )
+
+    # (argv, expected active modes)
+    _MODE_CASES = (
+        (["--albums"], {"albums"}),
         # --all gives us the basic 5 modes, plus albums is explicitly added
-        self.assertEqual(set(modes), {"people", "gps", "caption", "time", "rating", "albums"})
+        (["--all", "--albums"], {"people", "gps", "caption", "time", "rating", "albums"}),
+    )
+
+    def test_option_matrix(self):
+        for argv, attr, expected in self._OPTION_CASES:
+            with self.subTest(argv=argv, attr=attr):
+                parsed, _ = self.module.parse_cli_args(argv)
+                self.assertEqual(getattr(parsed, attr), expected)
+
+    def test_mode_matrix(self):
+        for argv, expected in self._MODE_CASES:
+            with self.subTest(argv=argv):
+                _, modes = self.module.parse_cli_args(argv)
+                self.assertEqual(set(modes), expected)
 
 
 class AlbumSyncTests(ModuleLoaderMixin):
+    _ASSET = types.MappingProxyType({"id": "test-asset-id", "isFavorite": False})
+    _DETAILS_EMPTY = types.MappingProxyType({"exifInfo": {}})
+
     def test_build_asset_album_map(self):
         # Mock album data
         mock_albums = [
@@ -262,7 +252,6 @@ class AlbumSyncTests(ModuleLoaderMixin):
         ]
         
         # Create a mock api_call function
-        import unittest.mock as mock
         with mock.patch('api.api_call', return_value=mock_albums):
             album_map = self.module.build_asset_album_map({}, "http://test", "test.log")
         
@@ -284,36 +273,32 @@ class AlbumSyncTests(ModuleLoaderMixin):
         self.assertNotIn("asset5", album_map)
     
     def test_build_exif_args_with_albums(self):
-        asset = {"id": "test-asset-id", "isFavorite": False}
-        details = {"exifInfo": {}}
         album_map = {
             "test-asset-id": ["Album1", "Album2", "Album3"]
         }
         
         args, changes = self.module.build_exif_args(
-            asset, details, ["albums"], album_map=album_map
+            self._ASSET, self._DETAILS_EMPTY, ["albums"], album_map=album_map
         )
         
         # Check that Albums is in changes
         self.assertIn("Albums", changes)
         
         # Check Event field (first album)
-        event_arg = next((a for a in args if a.startswith("-XMP-iptcExt:Event=")), None)
-        self.assertIsNotNone(event_arg)
-        self.assertEqual(event_arg, "-XMP-iptcExt:Event=Album1")
+        arg_map = _args_to_map(args)
+        self.assertEqual(arg_map.get("XMP-iptcExt:Event"), "Album1")
         
         # Check HierarchicalSubject field (all albums)
-        hierarchical_arg = next((a for a in args if a.startswith("-XMP:HierarchicalSubject=")), None)
-        self.assertIsNotNone(hierarchical_arg)
-        self.assertEqual(hierarchical_arg, "-XMP:HierarchicalSubject=Albums|Album1,Albums|Album2,Albums|Album3")
+        self.assertEqual(
+            arg_map.get("XMP:HierarchicalSubject"),
+            "Albums|Album1,Albums|Album2,Albums|Album3",
+        )
     
     def test_build_exif_args_without_albums(self):
-        asset = {"id": "test-asset-id", "isFavorite": False}
-        details = {"exifInfo": {}}
         album_map = {}  # Asset not in any albums
         
         args, changes = self.module.build_exif_args(
-            asset, details, ["albums"], album_map=album_map
+            self._ASSET, self._DETAILS_EMPTY, ["albums"], album_map=album_map
         )
         
         # No changes should be made if asset not in any albums
@@ -328,14 +313,16 @@ class RateLimiterTests(ModuleLoaderMixin):
         self.assertEqual(limiter.min_interval, 0.2)
     
     def test_rate_limiter_wait(self):
-        import time
         limiter = self.module.RateLimiter(calls_per_second=10.0)
-        start = time.time()
-        limiter.wait()
-        limiter.wait()
-        elapsed = time.time() - start
-        # Should have waited at least min_interval
-        self.assertGreaterEqual(elapsed, 0.09)  # Allow some margin
+        # Fake clock: first call is long after start, second call follows 20 ms later
+        clock = [100.0, 100.0, 100.02, 100.1]
+        with mock.patch("api.time.monotonic", side_effect=clock), \
+                mock.patch("api.time.sleep") as mock_sleep:
+            limiter.wait()
+            limiter.wait()
+        # Only the second call has to wait for the remainder of min_interval
+        mock_sleep.assert_called_once()
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 0.08)
 
 
 class ExifToolHelperTests(ModuleLoaderMixin):
@@ -346,39 +333,58 @@ class ExifToolHelperTests(ModuleLoaderMixin):
 
 class LogLevelTests(ModuleLoaderMixin):
     def test_log_level_enum(self):
-        self.assertEqual(self.module.LogLevel.DEBUG.value, 10)
-        self.assertEqual(self.module.LogLevel.INFO.value, 20)
-        self.assertEqual(self.module.LogLevel.WARNING.value, 30)
-        self.assertEqual(self.module.LogLevel.ERROR.value, 40)
+        self.assertEqual(self.LogLevel.DEBUG.value, 10)
+        self.assertEqual(self.LogLevel.INFO.value, 20)
+        self.assertEqual(self.LogLevel.WARNING.value, 30)
+        self.assertEqual(self.LogLevel.ERROR.value, 40)
     
     def test_set_log_level(self):
-        import utils
         original = utils._LOG_LEVEL
         self.module.set_log_level("DEBUG")
-        self.assertEqual(utils._LOG_LEVEL, self.module.LogLevel.DEBUG)
+        self.assertEqual(utils._LOG_LEVEL, self.LogLevel.DEBUG)
         self.module.set_log_level("ERROR")
-        self.assertEqual(utils._LOG_LEVEL, self.module.LogLevel.ERROR)
+        self.assertEqual(utils._LOG_LEVEL, self.LogLevel.ERROR)
         # Restore original
         utils._LOG_LEVEL = original
 
+    def test_log_file_rotates_at_max_bytes(self):
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir, ignore_errors=True)
+        log_file = os.path.join(test_dir, "sync.log")
+        with mock.patch.object(utils, "LOG_MAX_BYTES", 200), \
+                mock.patch.object(utils, "LOG_BACKUP_COUNT", 2), mock.patch("builtins.print"):
+            for i in range(20):
+                # Non-ASCII text: the limit counts encoded bytes, not characters
+                self.module.log(f"message {i:02d} " + "ä" * 40, log_file)
+        for path in (log_file, f"{log_file}.1", f"{log_file}.2"):
+            self.assertLessEqual(os.path.getsize(path), 200)
+        self.assertFalse(os.path.exists(f"{log_file}.3"))
+        with open(log_file, encoding="utf-8") as f:
+            self.assertIn("message 19", f.read())
+
 
 class AlbumCacheTests(ModuleLoaderMixin):
-    def setUp(self):
-        """Set up test environment with temporary directory."""
-        import tempfile
-        self.test_dir = tempfile.mkdtemp()
-        self.original_cache_file = self.module.ALBUM_CACHE_FILE
-        self.original_lock_file = self.module.ALBUM_CACHE_LOCK_FILE
-        # Override cache paths to use test directory
-        self.module.ALBUM_CACHE_FILE = f"{self.test_dir}/test_cache.json"
-        self.module.ALBUM_CACHE_LOCK_FILE = f"{self.test_dir}/test_cache.lock"
-    
-    def tearDown(self):
+    @classmethod
+    def setUpClass(cls):
+        """Create one temporary directory shared by all tests of this class."""
+        super().setUpClass()
+        cls.test_dir = tempfile.mkdtemp()
+        cls.original_cache_file = utils.ALBUM_CACHE_FILE
+        cls.original_lock_file = utils.ALBUM_CACHE_LOCK_FILE
+
+    @classmethod
+    def tearDownClass(cls):
         """Clean up test directory and restore original cache paths."""
-        import shutil
-        shutil.rmtree(self.test_dir, ignore_errors=True)
-        self.module.ALBUM_CACHE_FILE = self.original_cache_file
-        self.module.ALBUM_CACHE_LOCK_FILE = self.original_lock_file
+        shutil.rmtree(cls.test_dir, ignore_errors=True)
+        utils.ALBUM_CACHE_FILE = cls.original_cache_file
+        utils.ALBUM_CACHE_LOCK_FILE = cls.original_lock_file
+        super().tearDownClass()
+
+    def setUp(self):
+        """Point cache paths at per-test files inside the shared directory."""
+        # Patch utils itself: the cache helpers resolve these globals there
+        utils.ALBUM_CACHE_FILE = f"{self.test_dir}/{self.id()}.json"
+        utils.ALBUM_CACHE_LOCK_FILE = f"{self.test_dir}/{self.id()}.lock"
     
     def test_save_and_load_cache(self):
         """Test saving and loading cache within TTL."""
@@ -430,7 +436,6 @@ class AlbumCacheTests(ModuleLoaderMixin):
         self.assertTrue(result)
         
         # Verify cache is gone
-        import os
         self.assertFalse(os.path.exists(self.module.get_album_cache_path()))
     
     def test_clear_cache_nonexistent(self):
@@ -482,8 +487,6 @@ class AlbumCacheTests(ModuleLoaderMixin):
     
     def test_cache_file_permissions(self):
         """Test that cache file has restrictive permissions on POSIX systems."""
-        import os
-        import stat
         log_file = f"{self.test_dir}/test.log"
         
         # Create and save cache
@@ -512,25 +515,39 @@ class ConfigLoaderTests(ModuleLoaderMixin):
         self.assertEqual(config['IMMICH_INSTANCE_URL'], '')
         self.assertEqual(config['IMMICH_PHOTO_DIR'], self.module.DEFAULT_PHOTO_DIR)
 
+    def _write_config(self, suffix, data):
+        """Write `data` to a temporary config file that is removed after the test."""
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        try:
+            os.write(fd, data.encode("utf-8"))
+        finally:
+            os.close(fd)
+        self.addCleanup(os.unlink, path)
+        return path
+
     def test_load_config_env_file(self):
-        with tempfile.NamedTemporaryFile("w+", suffix=".env") as tmp:
-            tmp.write("IMMICH_INSTANCE_URL=https://demo.invalid\n")
-            tmp.write("IMMICH_API_KEY=abc123\n")
-            tmp.flush()
-            config = self.module.load_config(tmp.name)
-            self.assertEqual(config["IMMICH_INSTANCE_URL"], "https://demo.invalid")
-            self.assertEqual(config["IMMICH_API_KEY"], "abc123")
+        path = self._write_config(
+            ".env",
+            "IMMICH_INSTANCE_URL=https://demo.invalid\n"
+            "IMMICH_API_KEY=abc123\n",
+        )
+        config = self.module.load_config(path)
+        self.assertEqual(config["IMMICH_INSTANCE_URL"], "https://demo.invalid")
+        self.assertEqual(config["IMMICH_API_KEY"], "abc123")
 
     def test_load_config_json_file(self):
-        with tempfile.NamedTemporaryFile("w+", suffix=".json") as tmp:
-            json.dump({"IMMICH_INSTANCE_URL": "https://json.invalid", "IMMICH_LOG_FILE": "test.log"}, tmp)
-            tmp.flush()
-            config = self.module.load_config(tmp.name)
-            self.assertEqual(config["IMMICH_INSTANCE_URL"], "https://json.invalid")
-            self.assertEqual(config["IMMICH_LOG_FILE"], "test.log")
+        path = self._write_config(
+            ".json",
+            json.dumps({"IMMICH_INSTANCE_URL": "https://json.invalid", "IMMICH_LOG_FILE": "test.log"}),
+        )
+        config = self.module.load_config(path)
+        self.assertEqual(config["IMMICH_INSTANCE_URL"], "https://json.invalid")
+        self.assertEqual(config["IMMICH_LOG_FILE"], "test.log")
 
 
 class FaceCoordinatesTests(ModuleLoaderMixin):
+    _ASSET = types.MappingProxyType({"isFavorite": False})
+
     def test_convert_bbox_to_mwg_rs_basic(self):
         """Test basic bounding box to MWG-RS conversion."""
         result = self.module.convert_bbox_to_mwg_rs(100, 200, 300, 400, 4000, 3000)
@@ -553,47 +570,34 @@ class FaceCoordinatesTests(ModuleLoaderMixin):
         self.assertAlmostEqual(result["W"], 1.0, places=6)
         self.assertAlmostEqual(result["H"], 1.0, places=6)
 
-    def test_convert_bbox_to_mwg_rs_invalid_dimensions(self):
-        """Test conversion with invalid image dimensions."""
-        self.assertIsNone(self.module.convert_bbox_to_mwg_rs(0, 0, 100, 100, 0, 0))
-        self.assertIsNone(self.module.convert_bbox_to_mwg_rs(0, 0, 100, 100, -1, 100))
-
-    def test_convert_bbox_to_mwg_rs_invalid_bbox(self):
-        """Test conversion with invalid bounding box (x2 <= x1)."""
-        self.assertIsNone(self.module.convert_bbox_to_mwg_rs(300, 200, 100, 400, 4000, 3000))
-        self.assertIsNone(self.module.convert_bbox_to_mwg_rs(100, 400, 300, 200, 4000, 3000))
+    # (x1, y1, x2, y2, image_width, image_height) that must be rejected
+    _INVALID_BBOX_CASES = (
+        # Invalid image dimensions
+        (0, 0, 100, 100, 0, 0),
+        (0, 0, 100, 100, -1, 100),
+        # Invalid bounding box (x2 <= x1 or y2 <= y1)
+        (300, 200, 100, 400, 4000, 3000),
+        (100, 400, 300, 200, 4000, 3000),
+    )
+
+    def test_convert_bbox_to_mwg_rs_invalid_matrix(self):
+        """Test conversion with invalid dimensions or bounding boxes."""
+        for case in self._INVALID_BBOX_CASES:
+            with self.subTest(bbox=case):
+                self.assertIsNone(self.module.convert_bbox_to_mwg_rs(*case))
 
     def test_build_exif_args_face_coordinates(self):
         """Test that face coordinates generate MWG-RS region args."""
-        import json
-        asset = {"isFavorite": False}
-        details = {
-            "exifInfo": {},
-            "people": [
-                {
-                    "name": "Alice",
-                    "faces": [
-                        {
-                            "boundingBoxX1": 100,
-                            "boundingBoxY1": 200,
-                            "boundingBoxX2": 300,
-                            "boundingBoxY2": 400,
-                            "imageWidth": 4000,
-                            "imageHeight": 3000,
-                        }
-                    ],
-                }
-            ],
-        }
+        details = {"exifInfo": {}, "people": [_face("Alice", 100, 200, 300, 400)]}
 
-        args, changes = self.module.build_exif_args(asset, details, ["face-coordinates"])
+        args, changes = self.module.build_exif_args(self._ASSET, details, ["face-coordinates"])
 
         self.assertIn("FaceCoordinates", changes)
         self.assertIn("-struct", args)
-        region_arg = next((a for a in args if a.startswith("-RegionInfo=")), None)
-        self.assertIsNotNone(region_arg)
+        region_value = _args_to_map(args).get("RegionInfo")
+        self.assertIsNotNone(region_value)
 
-        region_json = json.loads(region_arg.split("=", 1)[1])
+        region_json = json.loads(region_value)
         self.assertEqual(region_json["AppliedToDimensions"]["W"], 4000)
         self.assertEqual(region_json["AppliedToDimensions"]["H"], 3000)
         self.assertEqual(len(region_json["RegionList"]), 1)
@@ -602,45 +606,18 @@ class FaceCoordinatesTests(ModuleLoaderMixin):
 
     def test_build_exif_args_face_coordinates_multiple_people(self):
         """Test MWG-RS with multiple people."""
-        import json
-        asset = {"isFavorite": False}
         details = {
             "exifInfo": {},
             "people": [
-                {
-                    "name": "Alice",
-                    "faces": [
-                        {
-                            "boundingBoxX1": 100,
-                            "boundingBoxY1": 200,
-                            "boundingBoxX2": 300,
-                            "boundingBoxY2": 400,
-                            "imageWidth": 4000,
-                            "imageHeight": 3000,
-                        }
-                    ],
-                },
-                {
-                    "name": "Bob",
-                    "faces": [
-                        {
-                            "boundingBoxX1": 500,
-                            "boundingBoxY1": 600,
-                            "boundingBoxX2": 700,
-                            "boundingBoxY2": 800,
-                            "imageWidth": 4000,
-                            "imageHeight": 3000,
-                        }
-                    ],
-                },
+                _face("Alice", 100, 200, 300, 400),
+                _face("Bob", 500, 600, 700, 800),
             ],
         }
 
-        args, changes = self.module.build_exif_args(asset, details, ["face-coordinates"])
+        args, changes = self.module.build_exif_args(self._ASSET, details, ["face-coordinates"])
 
         self.assertIn("FaceCoordinates", changes)
-        region_arg = next(a for a in args if a.startswith("-RegionInfo="))
-        region_json = json.loads(region_arg.split("=", 1)[1])
+        region_json = json.loads(_args_to_map(args)["RegionInfo"])
         self.assertEqual(len(region_json["RegionList"]), 2)
         names = [r["Name"] for r in region_json["RegionList"]]
         self.assertIn("Alice", names)
@@ -648,46 +625,25 @@ class FaceCoordinatesTests(ModuleLoaderMixin):
 
     def test_build_exif_args_face_coordinates_no_faces(self):
         """Test that no args are generated when people have no face data."""
-        asset = {"isFavorite": False}
         details = {
             "exifInfo": {},
             "people": [{"name": "Alice"}],  # No faces array
         }
 
-        args, changes = self.module.build_exif_args(asset, details, ["face-coordinates"])
+        args, changes = self.module.build_exif_args(self._ASSET, details, ["face-coordinates"])
         self.assertNotIn("FaceCoordinates", changes)
         self.assertEqual(args, [])
 
     def test_build_exif_args_face_coordinates_unnamed_person(self):
         """Test that unnamed persons are skipped."""
-        asset = {"isFavorite": False}
-        details = {
-            "exifInfo": {},
-            "people": [
-                {
-                    "name": "",
-                    "faces": [
-                        {
-                            "boundingBoxX1": 100,
-                            "boundingBoxY1": 200,
-                            "boundingBoxX2": 300,
-                            "boundingBoxY2": 400,
-                            "imageWidth": 4000,
-                            "imageHeight": 3000,
-                        }
-                    ],
-                }
-            ],
-        }
+        details = {"exifInfo": {}, "people": [_face("", 100, 200, 300, 400)]}
 
-        args, changes = self.module.build_exif_args(asset, details, ["face-coordinates"])
+        args, changes = self.module.build_exif_args(self._ASSET, details, ["face-coordinates"])
         self.assertNotIn("FaceCoordinates", changes)
         self.assertEqual(args, [])
 
-    def test_normalize_exif_value_regioninfo(self):
-        """Test normalization of RegionInfo for comparison."""
-        import json
-        region = {
+    _REGIONINFO_JSON = json.dumps(
+        {
             "AppliedToDimensions": {"W": 4000, "H": 3000, "Unit": "pixel"},
             "RegionList": [
                 {
@@ -696,47 +652,48 @@ class FaceCoordinatesTests(ModuleLoaderMixin):
                     "Type": "Face",
                 }
             ],
-        }
-        value = json.dumps(region)
-        result = self.module.normalize_exif_value(value, "RegionInfo")
-        self.assertIn("Alice:", result)
-        self.assertIn("0.05", result)
+        },
+        separators=(",", ":"),
+    )
 
-    def test_normalize_exif_value_regioninfo_sorted(self):
-        """Test that region normalization sorts by name."""
-        import json
-        region = {
+    _REGIONINFO_UNSORTED_JSON = json.dumps(
+        {
             "RegionList": [
                 {"Area": {"X": 0.5, "Y": 0.5, "W": 0.1, "H": 0.1}, "Name": "Zoe"},
                 {"Area": {"X": 0.3, "Y": 0.3, "W": 0.1, "H": 0.1}, "Name": "Alice"},
             ]
-        }
-        value = json.dumps(region)
-        result = self.module.normalize_exif_value(value, "RegionInfo")
+        },
+        separators=(",", ":"),
+    )
+
+    def test_normalize_exif_value_regioninfo(self):
+        """Test normalization of RegionInfo for comparison."""
+        result = self.module.normalize_exif_value(self._REGIONINFO_JSON, "RegionInfo")
+        self.assertIn("Alice:", result)
+        self.assertIn("0.05", result)
+
+    def test_normalize_exif_value_regioninfo_sorted(self):
+        """Test that region normalization sorts by name."""
+        result = self.module.normalize_exif_value(self._REGIONINFO_UNSORTED_JSON, "RegionInfo")
         # Alice should come before Zoe
         alice_pos = result.index("Alice")
         zoe_pos = result.index("Zoe")
         self.assertLess(alice_pos, zoe_pos)
 
-    def test_face_coordinates_cli_flag(self):
-        """Test that --face-coordinates flag is parsed correctly."""
-        parsed, modes = self.module.parse_cli_args(["--face-coordinates"])
-        self.assertTrue(parsed.face_coordinates)
-        self.assertIn("face-coordinates", modes)
-
-    def test_face_coordinates_not_in_all(self):
-        """Test that --all does NOT include face-coordinates."""
-        parsed, modes = self.module.parse_cli_args(["--all"])
-        self.assertNotIn("face-coordinates", modes)
-
-    def test_all_with_face_coordinates_flag(self):
-        """Test --all combined with --face-coordinates."""
-        parsed, modes = self.module.parse_cli_args(["--all", "--face-coordinates"])
-        self.assertIn("face-coordinates", modes)
-        self.assertEqual(
-            set(modes),
-            {"people", "gps", "caption", "time", "rating", "face-coordinates"},
-        )
+    # (argv, expected active modes) - --all does NOT include face-coordinates
+    _CLI_MODE_CASES = (
+        (["--face-coordinates"], {"face-coordinates"}),
+        (["--all"], {"people", "gps", "caption", "time", "rating"}),
+        (["--all", "--face-coordinates"], {"people", "gps", "caption", "time", "rating", "face-coordinates"}),
+    )
+
+    def test_face_coordinates_cli_matrix(self):
+        """Test --face-coordinates parsing alone and combined with --all."""
+        for argv, expected in self._CLI_MODE_CASES:
+            with self.subTest(argv=argv):
+                parsed, modes = self.module.parse_cli_args(argv)
+                self.assertEqual(parsed.face_coordinates, "face-coordinates" in expected)
+                self.assertEqual(set(modes), expected)
 
 
 class DirectoryValidationTests(ModuleLoaderMixin):
@@ -873,6 +830,23 @@ class RatingFavoriteTests(ModuleLoaderMixin):
         self.assertIn("-Rating=0", args)
         self.assertIn("-RatingPercent=0", args)
 
+    def test_rating_clamped_to_star_scale(self):
+        """Out-of-range ratings are clamped to 5 stars."""
+        details = {"exifInfo": {"rating": 7}}
+        args, _ = self.module.build_exif_args({"isFavorite": False}, details, ["rating"])
+        self.assertIn("-Rating=5", args)
+        self.assertIn("-RatingPercent=100", args)
+
+    def test_rejected_rating_is_kept(self):
+        """xmp:Rating -1 (rejected) is written as such, not turned into unrated."""
+        details = {"exifInfo": {"rating": -1}}
+        args, _ = self.module.build_exif_args({"isFavorite": False}, details, ["rating"])
+        self.assertIn("-XMP:Rating=-1", args)
+        self.assertIn("-Rating=-1", args)
+        self.assertIn("-MicrosoftPhoto:Rating=0", args)
+        self.assertIn("-RatingPercent=0", args)
+        self.assertEqual(self.module.normalize_exif_value("-1", "XMP:Rating"), "-1")
+
     def test_normalize_xmp_rating(self):
         """Normalize XMP:Rating values."""
         self.assertEqual(self.module.normalize_exif_value("3", "XMP:Rating"), "3")
@@ -997,6 +971,13 @@ class TimestampOldestDateTests(ModuleLoaderMixin):
         result = self.module.extract_date_from_filename("random_photo.jpg")
         self.assertIsNone(result)
 
+    def test_extract_date_from_filename_ranges(self):
+        """Out-of-range digit runs are rejected; trailing milliseconds are ignored."""
+        self.assertIsNone(self.module.extract_date_from_filename("IMG_12345678.jpg"))
+        self.assertIsNone(self.module.extract_date_from_filename("IMG_20210230.jpg"))
+        result = self.module.extract_date_from_filename("PXL_20230101_235959123.jpg")
+        self.assertEqual((result.hour, result.minute, result.second), (23, 59, 59))
+
     def test_extract_date_from_filename_empty(self):
         """Empty filename → None."""
         result = self.module.extract_date_from_filename("")
@@ -1096,12 +1077,26 @@ class TimestampOldestDateTests(ModuleLoaderMixin):
         self.assertIsNone(dt)
         dt = parse(None)
         self.assertIsNone(dt)
+
+    def test_parse_datetime_str_fast_path_fields(self):
+        """Fixed-width timestamps keep wall-clock fields and drop the timezone."""
+        parse = self.module._parse_datetime_str
+        dt = parse("2026-02-11T09:44:27.476+02:00")
+        self.assertEqual(
+            (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second, dt.microsecond),
+            (2026, 2, 11, 9, 44, 27, 476000),
+        )
+        self.assertIsNone(dt.tzinfo)
+        self.assertEqual(parse("2024:01:15 10:30:45"), parse("2024-01-15T10:30:45Z"))
+        # Out-of-range month
+        self.assertIsNone(parse("2024-13-15T10:30:45Z"))
+        # Date-only strings are still handled by the fallback
+        self.assertEqual(parse("2024-01-15").day, 15)
         
 class SidecarAndMsPhotoTests(ModuleLoaderMixin):
     """Tests for sidecar-aware write executor and MicrosoftPhoto fallback."""
 
     def test_execute_with_sidecar_reads_and_logs_previous_value_and_appends_target(self):
-        import unittest.mock as mock
         full_path = "/tmp/test/IMG-0001.jpg"
         sidecar_path = full_path + ".xmp"
     
@@ -1130,8 +1125,23 @@ class SidecarAndMsPhotoTests(ModuleLoaderMixin):
                     # ExifToolHelper.execute wurde genau einmal aufgerufen (kein MSPHOTO-Retry nötig)
                     self.assertEqual(mock_execute.call_count, 1)
 
+    def test_execute_with_sidecar_matches_windows_source_file(self):
+        import ntpath
+        full_path = "C:\\Photos\\2024\\IMG-0003.jpg"
+        sidecar_path = full_path + ".xmp"
+        # ExifTool reports Windows paths with forward slashes in SourceFile
+        fake_json = '[{"SourceFile":"C:/Photos/2024/IMG-0003.jpg.xmp","XMP:Rating":2}]'
+
+        with mock.patch.object(exif.os, "path", ntpath), \
+                mock.patch("exif.os.path.exists", return_value=True), \
+                mock.patch("exif.subprocess.run", return_value=mock.Mock(stdout=fake_json)):
+            helper = self.module.ExifToolHelper()
+            with mock.patch.object(helper, "execute", return_value=("", "")) as mock_execute:
+                self.module.execute_with_sidecar_and_msphoto(["-Rating=2"], full_path, helper, "test.log")
+
+        mock_execute.assert_called_once_with(["-Rating=2", full_path, sidecar_path])
+
     def test_execute_with_sidecar_retries_when_msphoto_not_writable(self):
-        import unittest.mock as mock
         full_path = "/tmp/test/IMG-0002.jpg"
         sidecar_path = full_path + ".xmp"
     
@@ -1160,5 +1170,45 @@ class SidecarAndMsPhotoTests(ModuleLoaderMixin):
                     # execute wurde zweimal aufgerufen: erster Versuch (mit MSPHOTO), zweiter Versuch (ohne MSPHOTO)
                     self.assertEqual(mock_execute.call_count, 2)
 
+    def test_execute_with_sidecar_no_retry_for_unrelated_warning(self):
+        full_path = "/tmp/test/IMG-0003.jpg"
+
+        with mock.patch("exif.os.path.exists", return_value=False), \
+                mock.patch("exif.subprocess.run", return_value=mock.Mock(stdout="")):
+            helper = self.module.ExifToolHelper()
+            warning = "Warning: Sorry, IPTC:Keywords exceeds length limit (truncated)\n"
+            with mock.patch.object(helper, "execute", return_value=(warning, "")) as mock_execute:
+                self.module.execute_with_sidecar_and_msphoto(
+                    ["-overwrite_original", "-MicrosoftPhoto:Rating=2"], full_path, helper, "test.log"
+                )
+                # Only MicrosoftPhoto warnings trigger the retry without MicrosoftPhoto:Rating
+                self.assertEqual(mock_execute.call_count, 1)
+
+    def test_sidecar_index_lists_each_directory_once(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sub = os.path.join(tmpdir, "user", "2024")
+            os.makedirs(sub)
+            for name in ("IMG-0004.jpg", "IMG-0004.jpg.xmp", "IMG-0005.jpg"):
+                Path(sub, name).touch()
+            index = self.module.SidecarIndex()
+            with mock.patch("exif.os.scandir", wraps=os.scandir) as mock_scandir:
+                self.assertIn(os.path.join(sub, "IMG-0004.jpg.xmp"), index)
+                self.assertNotIn(os.path.join(sub, "IMG-0005.jpg.xmp"), index)
+            mock_scandir.assert_called_once_with(sub)
+            # Unlistable directories fall back to os.path.exists()
+            self.assertNotIn(os.path.join(tmpdir, "missing", "IMG-0006.jpg.xmp"), index)
+
+            full_path = os.path.join(sub, "IMG-0004.jpg")
+            with mock.patch("exif.os.path.exists") as mock_exists, \
+                    mock.patch("exif.subprocess.run", return_value=mock.Mock(stdout="")):
+                helper = self.module.ExifToolHelper()
+                with mock.patch.object(helper, "execute", return_value=("", "")) as mock_execute:
+                    self.module.execute_with_sidecar_and_msphoto(
+                        ["-overwrite_original", "-Rating=2"], full_path, helper, "test.log", index
+                    )
+                # Index lookup replaces the per-asset stat(); sidecar is not readable here so not appended
+                mock_exists.assert_not_called()
+                self.assertEqual(mock_execute.call_count, 1)
+
 if __name__ == "__main__":
     unittest.main()
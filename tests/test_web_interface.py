@@ -0,0 +1,252 @@
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# Silence the development secret key warning on import
+os.environ.setdefault("FLASK_SECRET_KEY", "test-secret-key")
+import web_interface  # noqa: E402
+
+
+def _wait_for_sync():
+    """Block until the background sync (if any) has finished; the executor has a single worker."""
+    web_interface._sync_executor.submit(lambda: None).result(timeout=30)
+
+
+class WebInterfaceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = web_interface.app.test_client()
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir, ignore_errors=True)
+        web_interface.sync_status.update(running=False, last_run=None, last_result=None, last_log='')
+        web_interface._reset_output()
+
+
+class LogsEndpointTests(WebInterfaceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.log_file = os.path.join(self.test_dir, "sync.log")
+        env_patch = mock.patch.dict(os.environ, {"IMMICH_LOG_FILE": self.log_file})
+        env_patch.start()
+        self.addCleanup(env_patch.stop)
+
+    def _write(self, text, mode="a"):
+        with open(self.log_file, mode, encoding="utf-8") as f:
+            f.write(text)
+
+    def test_missing_log_file(self):
+        data = self.client.get("/api/logs").get_json()
+        self.assertEqual(data, {"logs": "No log file found", "offset": 0, "reset": True})
+
+    def test_first_request_returns_tail_with_reset(self):
+        self._write("".join(f"line {i}\n" for i in range(150)))
+        data = self.client.get("/api/logs").get_json()
+        self.assertTrue(data["reset"])
+        self.assertEqual(data["offset"], os.path.getsize(self.log_file))
+        lines = data["logs"].splitlines()
+        self.assertEqual(len(lines), web_interface.LOG_TAIL_LINES)
+        self.assertEqual(lines[-1], "line 149")
+
+    def test_since_offset_returns_only_appended_text(self):
+        self._write("first\n")
+        offset = self.client.get("/api/logs").get_json()["offset"]
+
+        unchanged = self.client.get(f"/api/logs?since={offset}").get_json()
+        self.assertEqual(unchanged, {"logs": "", "offset": offset, "reset": False})
+
+        self._write("second\nthird\n")
+        data = self.client.get(f"/api/logs?since={offset}").get_json()
+        self.assertFalse(data["reset"])
+        self.assertEqual(data["logs"], "second\nthird\n")
+        self.assertEqual(data["offset"], os.path.getsize(self.log_file))
+
+    def test_rotated_log_resets_to_tail(self):
+        self._write("old line\n" * 20)
+        offset = self.client.get("/api/logs").get_json()["offset"]
+        # Rotation leaves a new, shorter file behind the client's offset
+        os.replace(self.log_file, self.log_file + ".1")
+        self._write("new line\n", mode="w")
+        data = self.client.get(f"/api/logs?since={offset}").get_json()
+        self.assertTrue(data["reset"])
+        self.assertEqual(data["logs"], "new line\n")
+        self.assertEqual(data["offset"], len("new line\n"))
+
+    def test_client_too_far_behind_resets_to_tail(self):
+        self._write("x" * (web_interface.LOG_TAIL_BYTES + 10) + "\nlast\n")
+        data = self.client.get("/api/logs?since=0").get_json()
+        self.assertTrue(data["reset"])
+        self.assertEqual(data["logs"], "last\n")
+
+    def test_large_response_is_gzipped(self):
+        self._write("".join(f"line {i}\n" for i in range(100)))
+        response = self.client.get("/api/logs", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        data = json.loads(gzip.decompress(response.data))
+        self.assertIn("line 99", data["logs"])
+
+    def test_gzip_not_used_when_refused(self):
+        self._write("".join(f"line {i}\n" for i in range(100)))
+        for accept in ("gzip;q=0", "identity", ""):
+            with self.subTest(accept=accept):
+                response = self.client.get("/api/logs", headers={"Accept-Encoding": accept})
+                self.assertNotIn("Content-Encoding", response.headers)
+                self.assertIn("line 99", response.get_json()["logs"])
+
+
+class SyncEndpointTests(WebInterfaceTestCase):
+    def setUp(self):
+        super().setUp()
+        script = Path(self.test_dir, "fake_sync.py")
+        script.write_text(
+            "import os, sys\n"
+            "print('args', ' '.join(sys.argv[1:]))\n"
+            "print('batch', os.environ.get('IMMICH_ASSET_BATCH_SIZE'))\n"
+        )
+        script_patch = mock.patch.object(web_interface, "SYNC_SCRIPT", script)
+        script_patch.start()
+        self.addCleanup(script_patch.stop)
+        self.addCleanup(_wait_for_sync)
+
+    def test_sync_runs_in_background(self):
+        response = self.client.post("/api/sync", json={"albums": True})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_json()["status"], "started")
+        _wait_for_sync()
+
+        status = self.client.get("/api/status").get_json()
+        self.assertFalse(status["running"])
+        self.assertEqual(status["last_result"], "success")
+        self.assertIn("args --all --only-new --albums\n", status["last_log"])
+
+    def test_invalid_options_are_rejected(self):
+        cases = (
+            ([1, 2], "Request body must be a JSON object"),
+            ({"bogus": True}, "Invalid option(s): ['bogus']"),
+        )
+        for body, error in cases:
+            with self.subTest(body=body):
+                response = self.client.post("/api/sync", json=body)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.get_json(), {"error": error})
+        self.assertFalse(web_interface.sync_status["running"])
+
+    def test_invalid_batch_size_is_rejected(self):
+        cases = (
+            ("many", "batch_size must be an integer"),
+            (0, f"batch_size must be between 1 and {web_interface.MAX_SYNC_BATCH_SIZE}"),
+            (web_interface.MAX_SYNC_BATCH_SIZE + 1, f"batch_size must be between 1 and {web_interface.MAX_SYNC_BATCH_SIZE}"),
+        )
+        for batch_size, error in cases:
+            with self.subTest(batch_size=batch_size):
+                response = self.client.post("/api/sync", json={"batch_size": batch_size})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.get_json(), {"error": error})
+
+    def test_batch_size_is_passed_to_sync(self):
+        response = self.client.post("/api/sync", json={"batch_size": 50})
+        self.assertEqual(response.status_code, 202)
+        _wait_for_sync()
+        self.assertIn("batch 50\n", web_interface.sync_status["last_log"])
+
+    def test_second_sync_while_running_is_rejected(self):
+        web_interface.sync_status["running"] = True
+        response = self.client.post("/api/sync", json={})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json(), {"error": "Sync already running"})
+
+
+class ConditionalRequestTests(WebInterfaceTestCase):
+    def _assert_revalidates(self, path):
+        first = self.client.get(path)
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["ETag"]
+        second = self.client.get(path, headers={"If-None-Match": etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b"")
+        return etag
+
+    def test_status_not_modified_until_status_changes(self):
+        etag = self._assert_revalidates("/api/status")
+        web_interface._notify_clients()
+        response = self.client.get("/api/status", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_health_not_modified(self):
+        self._assert_revalidates("/health")
+
+
+    def test_index_not_modified(self):
+        etag = self._assert_revalidates("/")
+        response = self.client.get("/")
+        self.assertEqual(response.mimetype, "text/html")
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.data, (web_interface.TEMPLATES_DIR / "index.html").read_bytes())
+
+
+class EventStreamTests(WebInterfaceTestCase):
+    def setUp(self):
+        super().setUp()
+        coalesce_patch = mock.patch.object(web_interface, "SSE_COALESCE_SECONDS", 0)
+        coalesce_patch.start()
+        self.addCleanup(coalesce_patch.stop)
+
+    @staticmethod
+    def _add_output(lines):
+        with web_interface._events_cond:
+            web_interface.sync_output.extend(lines)
+            web_interface._sync_output_total += len(lines)
+            web_interface._events_seq += 1
+
+    def _frame(self, stream):
+        frame = next(stream)
+        self.assertTrue(frame.startswith("data: ") and frame.endswith("\n\n"), frame)
+        return json.loads(frame[len("data: "):])
+
+    def test_new_run_resets_client_log(self):
+        stream = web_interface._event_stream()
+        self._add_output([f"old{i}\n" for i in range(6)])
+        self.assertEqual(self._frame(stream)["event"], "status")
+        self.assertEqual(self._frame(stream)["lines"], [f"old{i}\n" for i in range(6)])
+
+        # The new run prints more lines than the client saw before its next frame
+        web_interface._reset_output()
+        self._add_output([f"new{i}\n" for i in range(10)])
+        frame = self._frame(stream)
+        self.assertTrue(frame["reset"])
+        self.assertEqual(frame["lines"], [f"new{i}\n" for i in range(10)])
+
+        self._add_output(["more\n"])
+        self.assertEqual(self._frame(stream), {"event": "log", "lines": ["more\n"], "reset": False})
+
+
+    def test_output_within_coalesce_window_is_sent_as_one_frame(self):
+        stream = web_interface._event_stream()
+        self._add_output(["a\n"])
+        self._frame(stream)
+        self._frame(stream)
+
+        self._add_output(["b\n"])
+        # More lines arrive while the stream waits out the coalescing window
+        with mock.patch.object(web_interface, "SSE_COALESCE_SECONDS", 0.1), \
+                mock.patch.object(web_interface.time, "sleep",
+                                  side_effect=lambda _: self._add_output(["c\n", "d\n"])) as mock_sleep:
+            frame = self._frame(stream)
+        mock_sleep.assert_called_once()
+        self.assertGreater(mock_sleep.call_args[0][0], 0)
+        self.assertLessEqual(mock_sleep.call_args[0][0], 0.1)
+        self.assertEqual(frame["lines"], ["b\n", "c\n", "d\n"])
+
+
+if __name__ == "__main__":
+    unittest.main()
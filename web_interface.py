@@ -11,18 +11,41 @@ For production use, consider:
 - Running behind a reverse proxy with authentication
 """
 
+import codecs
+import gzip
+import hashlib
 import os
-import sys
-import json
-import subprocess
+import threading
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import JSONProvider
+
+# Optional: orjson for faster JSON responses (falls back to Flask's default JSON provider)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, used for jsonify and request.get_json."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
-# Add script directory to path for imports
-sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'script'))
 
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
 
 # Secret key configuration with security warning
 secret_key = os.environ.get('FLASK_SECRET_KEY')
@@ -41,18 +64,291 @@ sync_status = {
 
 SCRIPT_DIR = Path(__file__).parent / 'script'
 SYNC_SCRIPT = SCRIPT_DIR / 'immich-ultra-sync.py'
+TEMPLATES_DIR = Path(__file__).parent / 'templates'
+# Browser cache lifetime of the main page in seconds; afterwards it is revalidated via ETag
+INDEX_MAX_AGE = 300
+
+# Output of the running sync: only the most recent lines are kept in memory.
+# The sync script itself already writes the full log to its log file.
+SYNC_OUTPUT_MAX_LINES = 2000
+sync_output = deque(maxlen=SYNC_OUTPUT_MAX_LINES)
+# Bytes requested per read from the sync's output pipe
+OUTPUT_READ_SIZE = 32 * 1024
+# Lines appended to sync_output since the current sync started (keeps counting past maxlen)
+_sync_output_total = 0
+# Incremented for every new sync run, so event streams notice the buffer was restarted
+_sync_run = 0
+
+# Change notification for /api/events: _events_seq is bumped on every status change or
+# new output line, and waiting event streams are woken through the condition.
+_events_cond = threading.Condition()
+_events_seq = 0
+# Distinguishes ETags of this server process from those of an earlier one (seq restarts at 0)
+_BOOT_ID = os.urandom(4).hex()
+SSE_KEEPALIVE_SECONDS = 15
+# Minimum spacing of event frames per client: output lines arriving in between are
+# batched into one frame instead of one frame per line
+SSE_COALESCE_SECONDS = 0.1
+
+
+# Upper bound for the batch_size option of /api/sync
+MAX_SYNC_BATCH_SIZE = 500
+
+# Boolean /api/sync options -> (default, CLI flag), in argv order
+SYNC_OPTION_FLAGS = {
+    'dry_run': (False, '--dry-run'),
+    'only_new': (True, '--only-new'),
+    'albums': (False, '--albums'),
+    'face_coordinates': (False, '--face-coordinates'),
+}
+VALID_SYNC_OPTIONS = frozenset(SYNC_OPTION_FLAGS) | {'batch_size'}
+
+# Syncs run in the background; a single worker means at most one sync at a time
+_sync_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sync')
+# Guards the check-and-set of sync_status['running'] against concurrent /api/sync requests
+_sync_lock = threading.Lock()
+
+
+def _notify_clients():
+    """Wake all /api/events streams after sync_status or sync_output changed."""
+    global _events_seq
+    with _events_cond:
+        _events_seq += 1
+        _events_cond.notify_all()
+
+
+def _reset_output():
+    """Clear the output buffer for a new sync run."""
+    global _sync_output_total, _sync_run
+    with _events_cond:
+        sync_output.clear()
+        _sync_output_total = 0
+        _sync_run += 1
+
+
+def _pump_output(stream):
+    """Read the child's combined stdout/stderr into sync_output, one line per entry."""
+    global _sync_output_total, _events_seq
+    # Read whatever the pipe holds (up to 32 KiB) per syscall instead of a line at a time;
+    # all complete lines of a chunk are published under a single lock acquisition
+    fd = stream.fileno()
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    while True:
+        chunk = os.read(fd, OUTPUT_READ_SIZE)
+        text = pending + decoder.decode(chunk, final=not chunk)
+        pending = ''
+        if chunk:
+            # Keep an unfinished last line (or a trailing \r that may start a \r\n) for the next read
+            end = max(text.rfind('\n'), text.rfind('\r', 0, len(text) - 1)) + 1
+            text, pending = text[:end], text[end:]
+        # Universal newlines, as in text-mode reads
+        lines = text.replace('\r\n', '\n').replace('\r', '\n').splitlines(keepends=True)
+        if lines:
+            with _events_cond:
+                sync_output.extend(lines)
+                _sync_output_total += len(lines)
+                _events_seq += 1
+                _events_cond.notify_all()
+        if not chunk:
+            break
+    stream.close()
+
+
+def _json_etag(obj):
+    """
+    JSON response with a weak ETag over the body; answers 304 if the client already has it.
+
+    The dashboard polls status/health every few seconds while nothing changes, so most
+    polls end up as a bodiless 304.
+    """
+    body = app.json.dumps(obj).encode('utf-8')
+    etag = hashlib.blake2s(body, digest_size=8).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _sse(payload):
+    """Encode payload as one Server-Sent Events data frame."""
+    return f"data: {app.json.dumps(payload)}\n\n"
+
+
+def _event_stream():
+    """
+    Push status changes and new sync output lines to one client.
+
+    Frames: {"event": "status", running, last_run, last_result} and
+    {"event": "log", "lines": [...], "reset": bool}; "reset" means the lines replace
+    what the client shows (first frame after connecting or a new sync run).
+    """
+    seen_seq = -1
+    seen_run = None
+    seen_lines = 0
+    reset = True
+    last_status = None
+    last_frame = 0.0
+    while True:
+        # Let a burst of output accumulate; the next frame then carries all of it
+        delay = last_frame + SSE_COALESCE_SECONDS - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        with _events_cond:
+            if seen_seq == _events_seq:
+                _events_cond.wait(timeout=SSE_KEEPALIVE_SECONDS)
+            changed = seen_seq != _events_seq
+            if changed:
+                seen_seq = _events_seq
+                status = {k: sync_status[k] for k in ('running', 'last_run', 'last_result')}
+                # A new sync run restarted the buffer: send its output from the start, and
+                # clear the client's view even before the run printed anything
+                new_run = seen_run is not None and seen_run != _sync_run
+                if seen_run != _sync_run:
+                    seen_run = _sync_run
+                    seen_lines = 0
+                    reset = True
+                new_count = min(_sync_output_total - seen_lines, len(sync_output))
+                lines = list(islice(sync_output, len(sync_output) - new_count, None))
+                seen_lines = _sync_output_total
+
+        if not changed:
+            # Comment frame keeps proxies from closing an idle connection
+            yield ': keepalive\n\n'
+            continue
+        last_frame = time.monotonic()
+        if status != last_status:
+            last_status = status
+            yield _sse({'event': 'status', **status})
+        if lines or new_run:
+            yield _sse({'event': 'log', 'lines': lines, 'reset': reset})
+            reset = False
+
+
+@app.route('/api/events')
+def events():
+    """Server-Sent Events stream of sync status changes and output lines."""
+    response = Response(_event_stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# JSON responses at least this large are gzip-compressed for clients that accept it
+COMPRESS_MIN_SIZE = 500
+COMPRESS_LEVEL = 6
+
+
+@app.after_request
+def _compress_json(response):
+    """Gzip larger JSON bodies (log text compresses very well); streams and 304s are left alone."""
+    if (
+        response.status_code != 200
+        or response.mimetype != 'application/json'
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or not request.accept_encodings['gzip']  # quality 0 ("gzip;q=0") means refused
+    ):
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+# Encoded main page and its ETag, read once on the first request
+_index_page = None
+
+
+def _load_index_page():
+    """Return (bytes, etag) of templates/index.html, reading the file only once."""
+    global _index_page
+    if _index_page is None:
+        body = (TEMPLATES_DIR / 'index.html').read_bytes()
+        _index_page = (body, hashlib.blake2s(body, digest_size=8).hexdigest())
+    return _index_page
 
 
 @app.route('/')
 def index():
     """Main page with sync controls."""
-    return render_template('index.html', status=sync_status)
+    # The page has no template variables (it loads everything via the API), so the same
+    # pre-encoded bytes are sent every time; reloads within the cache lifetime get a 304.
+    body, etag = _load_index_page()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={INDEX_MAX_AGE}'
+    return response
 
 
 @app.route('/api/status')
 def get_status():
     """Get current sync status."""
-    return jsonify(sync_status)
+    # _events_seq changes with every status change and output line, so it versions this
+    # response; matching polls get a 304 without building or serializing the body
+    with _events_cond:
+        etag = f"{_BOOT_ID}-{_events_seq}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    elif sync_status['running']:
+        # Expose the live output tail while the sync is still running
+        response = jsonify({**sync_status, 'last_log': ''.join(sync_output)})
+    else:
+        response = jsonify(sync_status)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _run_sync(cmd, env=None):
+    """Run the sync script, streaming its output into sync_output, and record the result."""
+    # Only needed when a sync actually runs
+    import subprocess
+
+    try:
+        # Stream the output into a bounded buffer instead of collecting it all in memory
+        process = subprocess.Popen(
+            cmd,
+            cwd=SCRIPT_DIR.parent,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0
+        )
+        reader = threading.Thread(target=_pump_output, args=(process.stdout,), daemon=True)
+        reader.start()
+
+        try:
+            returncode = process.wait(timeout=3600)  # 1 hour timeout
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            reader.join(timeout=5)
+            sync_status['last_result'] = 'timeout'
+            sync_status['last_log'] = ''.join(sync_output) + 'Sync operation timed out after 1 hour'
+            return
+
+        reader.join(timeout=5)
+        sync_status['last_result'] = 'success' if returncode == 0 else 'error'
+        sync_status['last_log'] = ''.join(sync_output)
+
+    except Exception as e:
+        sync_status['last_result'] = 'error'
+        sync_status['last_log'] = str(e)
+    finally:
+        with _sync_lock:
+            sync_status['running'] = False
+        _notify_clients()
 
 
 @app.route('/api/sync', methods=['POST'])
@@ -60,84 +356,119 @@ def trigger_sync():
     """
     Trigger a sync operation.
     
-    NOTE: This runs synchronously and blocks the request for the duration of the sync.
-    For large libraries, consider running the CLI directly in the background.
-    The web interface is best suited for smaller libraries or testing.
+    The sync runs in a background thread; the request returns 202 immediately.
+    Poll /api/status (and /api/logs) to follow progress and get the result.
+
+    JSON body (all optional): dry_run, only_new, albums, face_coordinates (bool),
+    batch_size (int, 1-MAX_SYNC_BATCH_SIZE): assets per detail request, passed to the
+    sync as IMMICH_ASSET_BATCH_SIZE.
     """
     global sync_status
     
-    if sync_status['running']:
-        return jsonify({'error': 'Sync already running'}), 409
-    
     # Get sync options from request
     data = request.get_json() or {}
-    dry_run = data.get('dry_run', False)
-    only_new = data.get('only_new', True)
-    albums = data.get('albums', False)
-    face_coordinates = data.get('face_coordinates', False)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    unknown = sorted(k for k in data if k not in VALID_SYNC_OPTIONS)
+    if unknown:
+        return jsonify({'error': f'Invalid option(s): {unknown}'}), 400
+    batch_size = data.get('batch_size')
+
+    env = None
+    if batch_size is not None:
+        try:
+            batch_size = int(batch_size)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'batch_size must be an integer'}), 400
+        if not 1 <= batch_size <= MAX_SYNC_BATCH_SIZE:
+            return jsonify({'error': f'batch_size must be between 1 and {MAX_SYNC_BATCH_SIZE}'}), 400
+        env = {**os.environ, 'IMMICH_ASSET_BATCH_SIZE': str(batch_size)}
     
     # Build command
     cmd = ['python3', str(SYNC_SCRIPT), '--all']
+    cmd.extend(
+        flag for option, (default, flag) in SYNC_OPTION_FLAGS.items()
+        if data.get(option, default)
+    )
     
-    if dry_run:
-        cmd.append('--dry-run')
-    if only_new:
-        cmd.append('--only-new')
-    if albums:
-        cmd.append('--albums')
-    if face_coordinates:
-        cmd.append('--face-coordinates')
-    
-    try:
+    with _sync_lock:
+        if sync_status['running']:
+            return jsonify({'error': 'Sync already running'}), 409
         sync_status['running'] = True
         sync_status['last_run'] = datetime.now().isoformat()
-        
-        # Run sync in background
-        result = subprocess.run(
-            cmd,
-            cwd=SCRIPT_DIR.parent,
-            capture_output=True,
-            text=True,
-            timeout=3600  # 1 hour timeout
-        )
-        
-        sync_status['running'] = False
-        sync_status['last_result'] = 'success' if result.returncode == 0 else 'error'
-        sync_status['last_log'] = result.stdout + result.stderr
-        
-        return jsonify({
-            'status': 'completed',
-            'result': sync_status['last_result'],
-            'output': sync_status['last_log']
-        })
-        
-    except subprocess.TimeoutExpired:
-        sync_status['running'] = False
-        sync_status['last_result'] = 'timeout'
-        sync_status['last_log'] = 'Sync operation timed out after 1 hour'
-        return jsonify({'error': 'Sync timed out'}), 500
-        
+
+    try:
+        _reset_output()
+        _notify_clients()
+        _sync_executor.submit(_run_sync, cmd, env)
     except Exception as e:
         sync_status['running'] = False
         sync_status['last_result'] = 'error'
         sync_status['last_log'] = str(e)
+        _notify_clients()
         return jsonify({'error': str(e)}), 500
 
+    return jsonify({
+        'status': 'started',
+        'started_at': sync_status['last_run']
+    }), 202
+
+
+# /api/logs returns the last LOG_TAIL_LINES lines, read from at most LOG_TAIL_BYTES at the end of the file
+LOG_TAIL_LINES = 100
+LOG_TAIL_BYTES = 64 * 1024
+
+# Last tail read as ((path, size, mtime_ns), tail) so unchanged files are not read again.
+# Replaced as one tuple: concurrent requests never see a new key paired with an old tail.
+_log_tail_cache = (None, '')
+
+
+def _read_log_tail(log_file, st):
+    """Return the last LOG_TAIL_LINES lines of log_file by seeking near its end."""
+    global _log_tail_cache
+    key = (log_file, st.st_size, st.st_mtime_ns)
+    cached_key, cached_tail = _log_tail_cache
+    if cached_key == key:
+        return cached_tail
+
+    with open(log_file, 'rb') as f:
+        offset = max(0, st.st_size - LOG_TAIL_BYTES)
+        f.seek(offset)
+        data = f.read().decode('utf-8', errors='replace')
+    lines = data.splitlines(keepends=True)
+    if offset > 0 and lines:
+        # First line is most likely cut off by the seek
+        lines = lines[1:]
+    tail = ''.join(lines[-LOG_TAIL_LINES:])
+
+    _log_tail_cache = (key, tail)
+    return tail
+
 
 @app.route('/api/logs')
 def get_logs():
     """Get recent log entries."""
     log_file = os.environ.get('IMMICH_LOG_FILE', 'immich_ultra_sync.txt')
     
+    # ?since=<offset> (the "offset" of the previous response) returns only what was appended
+    # since then; "reset" tells the client to replace its view with a fresh tail instead
+    since = request.args.get('since', type=int)
+    
     try:
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                # Get last 100 lines
-                lines = f.readlines()
-                recent_lines = lines[-100:] if len(lines) > 100 else lines
-                return jsonify({'logs': ''.join(recent_lines)})
-        else:
-            return jsonify({'logs': 'No log file found'})
+        try:
+            st = os.stat(log_file)
+        except FileNotFoundError:
+            return jsonify({'logs': 'No log file found', 'offset': 0, 'reset': True})
+        size = st.st_size
+        if since is not None and 0 <= since <= size and size - since <= LOG_TAIL_BYTES:
+            delta = ''
+            if since < size:
+                with open(log_file, 'rb') as f:
+                    f.seek(since)
+                    delta = f.read(size - since).decode('utf-8', errors='replace')
+            return jsonify({'logs': delta, 'offset': size, 'reset': False})
+        # First request, truncated/rotated file or too far behind: send the tail
+        return jsonify({'logs': _read_log_tail(log_file, st), 'offset': size, 'reset': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -145,7 +476,7 @@ def get_logs():
 @app.route('/health')
 def health():
     """Health check endpoint."""
-    return jsonify({
+    return _json_etag({
         'status': 'healthy',
         'version': '1.5.0',
         'sync_running': sync_status['running']
@@ -154,8 +485,7 @@ def health():
 
 if __name__ == '__main__':
     # Create templates directory if it doesn't exist
-    templates_dir = Path(__file__).parent / 'templates'
-    templates_dir.mkdir(exist_ok=True)
+    TEMPLATES_DIR.mkdir(exist_ok=True)
     
     # Run the Flask app
     port = int(os.environ.get('FLASK_PORT', 5000))
@@ -169,4 +499,16 @@ if __name__ == '__main__':
         print("         Consider using 127.0.0.1 or implement authentication for production use.")
     print(f"Open http://localhost:{port} in your browser")
     
-    app.run(host=host, port=port, debug=debug)
+    # Optional: waitress as production WSGI server (each open /api/events stream holds one thread)
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    
+    if serve is not None and not debug:
+        threads = max(4, int(os.environ.get('FLASK_THREADS', 16)))
+        print(f"Serving with waitress ({threads} threads)")
+        serve(app, host=host, port=port, threads=threads)
+    else:
+        # Development server; threaded so event streams do not block other requests
+        app.run(host=host, port=port, debug=debug, threaded=True)